@@ -0,0 +1,286 @@
+"""asyncio front end for validation, plus a small HTTP server around it.
+
+Run a local stand-in validation service for load tests with::
+
+    python async_validation.py --port 8080
+
+then POST quote or contract payloads to ``/validate/quote`` or
+``/validate/contract``.
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+from batch_validation import batch_validator
+from stages import STAGES
+from validation_errors import FAIL_FAST, MODES, error_limit
+
+# Stage validators of this process; built once by _init_worker (in every
+# pool worker, or in the main process when validating on threads).
+_validators = {}
+
+
+def _init_worker(schema, memoize=False):
+    for stage in STAGES:
+        _validators[stage] = batch_validator(schema, stage, memoize)
+
+
+def _report(validator, payload, limit):
+    return [
+        {"path": v.json_path, "keyword": v.keyword, "message": v.message}
+        for v in validator.errors(payload, limit)
+    ]
+
+
+def _check_body(stage, body, limit):
+    # Raw bodies are cheap to send to a worker; parsing happens there too.
+    try:
+        payload = json.loads(body)
+    except RecursionError:
+        # json.loads recurses once per nesting level.
+        raise ValueError("JSON nested too deeply") from None
+    return _report(_validators[stage], payload, limit)
+
+
+def _check_payload(stage, payload, limit):
+    return _report(_validators[stage], payload, limit)
+
+
+class Overloaded(Exception):
+    """Every validation slot is busy and the caller asked not to wait."""
+
+
+class AsyncValidator:
+    """Validates quote/contract payloads for coroutines without blocking the loop.
+
+    Validation runs in a process pool (``executor="process"``, the default)
+    or a thread pool (``"thread"``). At most ``max_pending`` validations are
+    in flight; further callers wait for a free slot, which gives natural
+    backpressure, or get Overloaded straight away with ``wait=False``.
+    Results are lists of ``{"path", "keyword", "message"}`` dicts, empty
+    for a valid payload. ``memoize`` is as for ``validation.validate_payload``:
+    it only pays off for ``check``, since ``check_body`` parses every body
+    into distinct objects.
+    """
+
+    def __init__(
+        self,
+        schema,
+        workers=None,
+        max_pending=64,
+        executor="process",
+        mode=FAIL_FAST,
+        max_errors=100,
+        memoize=False,
+    ):
+        self.limit = error_limit(mode, max_errors)
+        if executor == "process":
+            self._executor = ProcessPoolExecutor(
+                workers, initializer=_init_worker, initargs=(schema, memoize)
+            )
+        elif executor == "thread":
+            _init_worker(schema, memoize)
+            self._executor = ThreadPoolExecutor(workers)
+        else:
+            raise ValueError("executor must be 'process' or 'thread'")
+        self._slots = asyncio.Semaphore(max_pending)
+
+    @property
+    def saturated(self):
+        return self._slots.locked()
+
+    async def _run(self, function, stage, data, wait):
+        if stage not in STAGES:
+            raise ValueError("unknown stage %r" % (stage,))
+        if not wait and self._slots.locked():
+            raise Overloaded
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, function, stage, data, self.limit
+            )
+
+    async def check_body(self, stage, body, wait=True):
+        """Parse and validate a raw JSON body; ValueError if it is not JSON."""
+        return await self._run(_check_body, stage, bytes(body), wait)
+
+    async def check(self, stage, payload, wait=True):
+        """Validate an already-parsed payload."""
+        return await self._run(_check_payload, stage, payload, wait)
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+_INDEX = re.compile(r"\[\d+\]")
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    503: "Service Unavailable",
+}
+
+
+class ValidationServer:
+    """Minimal HTTP/1.1 server (keep-alive, Content-Length bodies only).
+
+    ``POST /validate/<stage>`` answers 200 ``{"valid": true}``, 422 with the
+    errors, 400 for malformed JSON, 413 for bodies over ``max_body`` bytes
+    and 503 when every validation slot is busy. ``GET /metrics`` returns
+    the metrics registry in the Prometheus text format. It is a stand-in for the
+    real gateway in load tests, not a production HTTP server.
+    """
+
+    def __init__(self, validator, host="127.0.0.1", port=8080, max_body=1 << 20):
+        self.validator = validator
+        self.host = host
+        self.port = port
+        self.max_body = max_body
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > self.max_body:
+                    await self._respond(writer, 413, {"error": "body too large"}, False)
+                    break
+                body = await reader.readexactly(length)
+                status, result = await self._route(method, target, body)
+                keep_alive = (
+                    version == "HTTP/1.1"
+                    and headers.get("connection", "").lower() != "close"
+                )
+                await self._respond(writer, status, result, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, body):
+        if target == "/metrics" and method == "GET":
+            return 200, metrics.REGISTRY.expose()
+        prefix = "/validate/"
+        stage = target[len(prefix) :]
+        if not target.startswith(prefix) or stage not in STAGES:
+            return 404, {"error": "not found"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        start = time.perf_counter()
+        try:
+            errors = await self.validator.check_body(stage, body, wait=False)
+        except Overloaded:
+            return 503, {"error": "overloaded"}
+        except ValueError as e:
+            seconds = time.perf_counter() - start
+            metrics.observe_validation(stage, seconds, size=len(body), malformed=True)
+            return 400, {"error": "invalid JSON: %s" % e}
+        failures = [_INDEX.sub("[*]", error["path"]) for error in errors]
+        seconds = time.perf_counter() - start
+        metrics.observe_validation(stage, seconds, failures, len(body))
+        if errors:
+            return 422, {"valid": False, "errors": errors}
+        return 200, {"valid": True}
+
+    @staticmethod
+    async def _respond(writer, status, result, keep_alive):
+        if isinstance(result, str):
+            body, content_type = result.encode("utf-8"), metrics.CONTENT_TYPE
+        else:
+            body = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        head = (
+            "HTTP/1.1 %d %s\r\n"
+            "Content-Type: %s\r\n"
+            "Content-Length: %d\r\n"
+            "Connection: %s\r\n\r\n"
+            % (
+                status,
+                _REASONS[status],
+                content_type,
+                len(body),
+                "keep-alive" if keep_alive else "close",
+            )
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def _serve(args):
+    from testJsonschema import json_str
+
+    async with AsyncValidator(
+        json_str,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        executor=args.executor,
+        mode=args.mode,
+        max_errors=args.max_errors,
+    ) as validator:
+        server = await ValidationServer(validator, args.host, args.port).start()
+        print(
+            "validating on http://%s:%d/validate/{quote,contract}"
+            % (args.host, server.port)
+        )
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local validation HTTP server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    parser.add_argument("--mode", choices=MODES, default=FAIL_FAST)
+    parser.add_argument("--max-errors", type=int, default=100)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
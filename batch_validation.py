@@ -0,0 +1,54 @@
+from array import array
+
+from codegen_validator import compile_memoized, compile_validator
+from stages import compile_stage
+
+
+class BatchResult:
+    """Per-item verdicts of a batch, kept in two flat arrays.
+
+    ``valid[i]`` is 1 if the i-th instance passed and 0 otherwise;
+    ``invalid`` holds the indices of the instances that failed, in order.
+    """
+
+    __slots__ = ("valid", "invalid")
+
+    def __init__(self, valid, invalid):
+        self.valid = valid
+        self.invalid = invalid
+
+    @classmethod
+    def from_flags(cls, valid):
+        return cls(valid, array("l", [i for i, ok in enumerate(valid) if not ok]))
+
+    def __len__(self):
+        return len(self.valid)
+
+    @property
+    def all_valid(self):
+        return not self.invalid
+
+    def __repr__(self):
+        return "<BatchResult %d items, %d invalid>" % (len(self), len(self.invalid))
+
+
+def batch_validator(schema, stage=None, memoize=False):
+    """The validator for ``schema``, or for one of its stages.
+
+    ``memoize`` is as for ``validation.validate_payload``.
+    """
+    compile = compile_memoized if memoize else compile_validator
+    if stage is None:
+        return compile(schema)
+    return compile_stage(schema, stage, compile)
+
+
+def validate_batch(instances, schema, stage=None, memoize=False):
+    """Validate every instance of an iterable against ``schema``.
+
+    The validator is looked up once for the whole batch, so each item only
+    pays for walking its own document. With ``stage`` each instance is a
+    quote or contract payload; ``memoize`` is as for ``batch_validator``.
+    """
+    is_valid = batch_validator(schema, stage, memoize).is_valid
+    return BatchResult.from_flags(bytearray(map(is_valid, instances)))
@@ -0,0 +1,66 @@
+"""Compare validate_batch with a loop over jsonschema.validate.
+
+Run from the repository root: python -m benchmarks.bench_batch
+"""
+
+import copy
+import time
+
+import jsonschema
+
+from batch_validation import validate_batch
+from schema_validator import compile_schema
+from stages import stage_schema
+from testJsonschema import data_valid, json_str
+
+
+def _payloads(template, count):
+    payloads = []
+    for i in range(count):
+        payload = copy.deepcopy(template)
+        if i % 10 == 0:
+            # Roughly one invalid payload in ten.
+            del payload["insurance_holder"]["phones"][0]["number"]
+        payloads.append(payload)
+    return payloads
+
+
+def _timed(label, count, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(
+        "%-28s %10.1f us/item %12.0f items/s"
+        % (label, elapsed / count * 1e6, count / elapsed)
+    )
+
+
+def main():
+    # The contract payload of data_valid is missing name/cpf/email, which the
+    # contract stage requires; fill them in so most payloads are valid.
+    template = copy.deepcopy(data_valid["contract"])
+    template["insurance_holder"].update(name="n", cpf="c", email="e")
+    schema = stage_schema(json_str, "contract")
+    small, large = _payloads(template, 50), _payloads(template, 20000)
+
+    def validate_loop():
+        for payload in small:
+            try:
+                jsonschema.validate(payload, schema)
+            except jsonschema.ValidationError:
+                pass
+
+    def compiled_loop():
+        validator = compile_schema(schema)
+        for payload in large:
+            validator.is_valid(payload)
+
+    _timed("loop over validate()", len(small), validate_loop)
+    _timed("loop over compiled is_valid", len(large), compiled_loop)
+    _timed("validate_batch", len(large), lambda: validate_batch(large, schema))
+    result = validate_batch(large, schema)
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Import time of the validation entry point, checked against a budget.
+
+Every case runs in fresh interpreters under ``python -X importtime``: the
+median of the time spent importing, interpreter startup left out, and the
+modules with the most time of their own are reported. A case fails when it
+goes over its budget or imports a module that its path is meant to avoid
+(jsonschema, jsonref and requests are only needed to build a validator
+from scratch, not to load one from validator_cache and run it).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --budget-scale 2  # slower machines
+
+It exits non-zero if a case fails.
+"""
+
+import argparse
+import subprocess
+import sys
+
+# Modules that must stay out of the slim path.
+HEAVY = ("jsonschema", "jsonref", "requests", "http.server", "concurrent.futures")
+
+_FIRST_VALIDATION = """
+from testJsonschema import data_valid, json_str
+from validation import check_payload
+check_payload(data_valid["contract"], json_str, stage="contract")
+"""
+
+_REPORT = """
+import sys
+print(" ".join(sorted(sys.modules)))
+"""
+
+# (name, code, budget in ms)
+CASES = [
+    ("import validation", "import validation", 80.0),
+    ("first validation", _FIRST_VALIDATION, 100.0),
+]
+
+
+def _run(code):
+    """``(importtime lines, imported module names)`` of one fresh interpreter.
+
+    Lines are ``(name, depth, self us, cumulative us)``.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code + _REPORT],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    lines = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line[13:]:
+            continue
+        self_us, cumulative_us, name = line[12:].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        name = name.rstrip()[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        lines.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return lines, set(result.stdout.split())
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def run_case(code, startup, repeat=5):
+    """Median import ms, heavy modules imported, and ``(self us, module)`` rows.
+
+    ``startup`` are the modules the interpreter imports on its own.
+    """
+    _run(code)  # warm the bytecode and validator caches first
+    totals, own = [], {}
+    for _ in range(repeat):
+        lines, imported = _run(code)
+        totals.append(
+            sum(
+                us for name, depth, _, us in lines if depth == 0 and name not in startup
+            )
+        )
+        for name, _, self_us, _ in lines:
+            if name not in startup:
+                own.setdefault(name, []).append(self_us)
+    heavy = sorted(m for m in HEAVY if m in imported)
+    slowest = sorted(((_median(us), name) for name, us in own.items()), reverse=True)
+    return _median(totals) / 1e3, heavy, slowest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-scale", type=float, default=1.0)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    startup = {name for name, _, _, _ in _run("pass")[0]}
+    failed = False
+    for name, code, budget in CASES:
+        budget *= args.budget_scale
+        ms, heavy, slowest = run_case(code, startup, args.repeat)
+        ok = ms <= budget and not heavy
+        failed |= not ok
+        print(
+            "%-18s %8.1f ms  budget %6.1f ms  %s"
+            % (name, ms, budget, "ok" if ok else "FAIL")
+        )
+        if heavy:
+            print("  imports %s" % ", ".join(heavy))
+        for us, module in slowest[: args.top]:
+            print("  %8.1f ms  %s" % (us / 1e3, module))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
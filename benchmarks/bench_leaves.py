@@ -0,0 +1,85 @@
+"""Generated validators with and without the plain-leaf fast path.
+
+Both variants are generated from the same flattened schema in this process
+and timed in alternating rounds, so the ratio holds up on a busy machine
+where absolute timings do not.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_leaves
+"""
+
+import argparse
+import copy
+import statistics
+import time
+
+from benchmarks.bench_suite import RISK_SCHEMA, _contract, _risk_people
+from codegen_validator import _Generator
+from schema_flattener import flatten_schema
+from stages import stage_schema
+from testJsonschema import data_valid, json_str
+
+
+class _GenericGenerator(_Generator):
+    """Generates every leaf through the generic body(), as before."""
+
+    def leaf_type(self, schema):
+        return None
+
+
+def _compile(generator):
+    namespace = {}
+    exec(compile(generator.generate(), "<bench>", "exec"), namespace)
+    return namespace["validate"]
+
+
+def cases():
+    """(name, schema, payload); data_valid's contract completed to be valid."""
+    contract = copy.deepcopy(data_valid["contract"])
+    contract["insurance_holder"].update(name="Fulano", cpf="0", email="f@x")
+    yield "data_valid quote", stage_schema(json_str, "quote"), data_valid["quote"]
+    yield "data_valid contract", stage_schema(json_str, "contract"), contract
+    yield "contract x100", stage_schema(json_str, "contract"), _contract(100)
+    yield "risk_people x100", RISK_SCHEMA, _risk_people(100)
+
+
+def run(schema, payload, rounds=200, round_time=0.002):
+    flattened = flatten_schema(schema)
+    generic = _compile(_GenericGenerator(flattened))
+    leaves = _compile(_Generator(flattened))
+    if generic(payload) != leaves(payload):
+        raise AssertionError("the two validators disagree")
+    start = time.perf_counter()
+    generic(payload)
+    number = max(1, int(round_time / max(time.perf_counter() - start, 1e-7)))
+    clock = time.perf_counter
+    ratios, before, after = [], [], []
+    for _ in range(rounds):
+        t0 = clock()
+        for _ in range(number):
+            generic(payload)
+        t1 = clock()
+        for _ in range(number):
+            leaves(payload)
+        t2 = clock()
+        before.append((t1 - t0) / number)
+        after.append((t2 - t1) / number)
+        ratios.append((t1 - t0) / (t2 - t1))
+    return min(before), min(after), statistics.median(ratios)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args(argv)
+    for name, schema, payload in cases():
+        generic, leaves, ratio = run(schema, payload, args.rounds)
+        print(
+            "%-22s generic %9.2f us  leaves %9.2f us  x%.2f"
+            % (name, generic * 1e6, leaves * 1e6, ratio)
+        )
+
+
+if __name__ == "__main__":
+    main()
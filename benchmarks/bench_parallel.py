@@ -0,0 +1,45 @@
+"""Measure how validate_parallel scales with the number of workers.
+
+Run from the repository root: python -m benchmarks.bench_parallel
+"""
+
+import copy
+import os
+import time
+
+from batch_validation import validate_batch
+from parallel_validation import ParallelValidator
+from stages import stage_schema
+from testJsonschema import data_valid, json_str
+
+
+def main():
+    template = copy.deepcopy(data_valid["contract"])
+    template["insurance_holder"].update(name="n", cpf="c", email="e")
+    template["insurance_holder"]["phones"] *= 25
+    payloads = [copy.deepcopy(template) for _ in range(20000)]
+    schema = stage_schema(json_str, "contract")
+
+    start = time.perf_counter()
+    expected = validate_batch(payloads, schema)
+    serial = time.perf_counter() - start
+    print("%-12s %8.3f s" % ("serial", serial))
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        with ParallelValidator(schema, workers=workers, chunk_size=500) as pool:
+            # One chunk per worker, so that every worker is started (and
+            # has built its validator) before the clock starts.
+            pool.validate(payloads[: workers * pool.chunk_size])
+            start = time.perf_counter()
+            result = pool.validate(payloads)
+            elapsed = time.perf_counter() - start
+        assert result.valid == expected.valid
+        print(
+            "%-12s %8.3f s  x%.2f" % ("%d workers" % workers, elapsed, serial / elapsed)
+        )
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
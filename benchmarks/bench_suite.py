@@ -0,0 +1,214 @@
+"""Latency, throughput and memory of the validation entry point.
+
+Every case validates one payload repeatedly through check_payload and
+reports p50/p99 latency, throughput and the tracemalloc peak of a single
+validation. Cold cases time the first validation in a fresh interpreter,
+schema compilation included. Results are written as JSON so that runs can
+be compared across versions.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_suite --output before.json
+    python -m benchmarks.bench_suite --output after.json --compare before.json
+
+With --profile the cases run on profiling validators instead (so timings
+are not comparable) and the per-$ref and per-keyword profile is printed.
+"""
+
+import argparse
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import profiling
+import validation
+from testJsonschema import data_valid, json_str
+from validation import check_payload
+
+SIZES = (1, 100, 10000)
+
+# risk_people is not used by either stage; validate it on its own.
+RISK_SCHEMA = {
+    "type": "object",
+    "properties": {"risk_people": {"$ref": "#/definitions/risk_people"}},
+    "definitions": json_str["definitions"],
+}
+
+_COLD = """
+import time
+start = time.perf_counter()
+from testJsonschema import data_valid, json_str
+from validation import check_payload
+check_payload(data_valid[%(stage)r], json_str, stage=%(stage)r)
+print(time.perf_counter() - start)
+"""
+
+
+def _contract(size):
+    payload = copy.deepcopy(data_valid["contract"])
+    holder = payload["insurance_holder"]
+    holder.update(name="Fulano de Tal", cpf="000.000.000-00", email="f@example.com")
+    holder["phones"] = [dict(holder["phones"][i % 4]) for i in range(size)]
+    holder["addresses"] = [dict(holder["addresses"][0]) for _ in range(size)]
+    return payload
+
+
+def _risk_people(size):
+    person = {
+        "cpf": "000.000.000-00",
+        "name": "Fulano de Tal",
+        "birth_date": "1980-01-01",
+        "rg": {"number": "00.000.000-0", "issuing_agency": "SSP"},
+        "addresses": copy.deepcopy(
+            data_valid["contract"]["insurance_holder"]["addresses"]
+        ),
+        "phones": copy.deepcopy(data_valid["contract"]["insurance_holder"]["phones"]),
+        "politically_exposed": False,
+    }
+    return {"risk_people": [copy.deepcopy(person) for _ in range(size)]}
+
+
+def cases():
+    """(name, schema, stage, payload) for every warm case."""
+    yield "data_valid quote", json_str, "quote", data_valid["quote"]
+    # As written, data_valid's contract lacks name/cpf/email: the error path.
+    yield "data_valid contract", json_str, "contract", data_valid["contract"]
+    for size in SIZES:
+        yield "contract x%d" % size, json_str, "contract", _contract(size)
+    for size in SIZES:
+        yield "risk_people x%d" % size, RISK_SCHEMA, None, _risk_people(size)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_warm(name, schema, stage, payload, min_time=0.5, max_runs=20000):
+    validate = lambda: check_payload(payload, schema, stage=stage)
+    valid = not validate()  # compile and warm every cache first
+    timings = []
+    clock = time.perf_counter
+    deadline = clock() + min_time
+    while len(timings) < max_runs and (len(timings) < 20 or clock() < deadline):
+        start = clock()
+        validate()
+        timings.append(clock() - start)
+    timings.sort()
+
+    tracemalloc.start()
+    validate()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "case": name,
+        "stage": stage,
+        "valid": valid,
+        "payload_bytes": len(json.dumps(payload).encode("utf-8")),
+        "runs": len(timings),
+        "p50_us": _percentile(timings, 0.50) * 1e6,
+        "p99_us": _percentile(timings, 0.99) * 1e6,
+        "per_second": len(timings) / sum(timings),
+        "peak_kib": peak / 1024.0,
+    }
+
+
+def run_cold(stage, repeat=5):
+    """First check_payload call in fresh interpreters, imports included.
+
+    The on-disk validator cache is off, so every run compiles the schema.
+    """
+    timings = []
+    env = dict(os.environ, VALIDATOR_CACHE_DIR="off")
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _COLD % {"stage": stage}],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        timings.append(float(output.split()[-1]))
+    timings.sort()
+    return {
+        "case": "cold %s" % stage,
+        "stage": stage,
+        "runs": repeat,
+        "p50_us": _percentile(timings, 0.50) * 1e6,
+        "max_us": timings[-1] * 1e6,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print(results, baseline):
+    before = {r["case"]: r for r in baseline["results"]} if baseline else {}
+    for r in results:
+        line = "%-22s p50 %11.1f us" % (r["case"], r["p50_us"])
+        if "p99_us" in r:
+            line += "  p99 %11.1f us  %10.0f/s  peak %9.1f KiB" % (
+                r["p99_us"],
+                r["per_second"],
+                r["peak_kib"],
+            )
+        old = before.get(r["case"])
+        if old is not None:
+            line += "  x%.2f" % (old["p50_us"] / r["p50_us"])
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run")
+    parser.add_argument("--min-time", type=float, default=0.5)
+    parser.add_argument("--no-cold", action="store_true")
+    parser.add_argument("--profile", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        validation.enable_profiling()
+        for case in cases():
+            run_warm(*case, min_time=args.min_time)
+        print(profiling.format_profile(profiling.profile(), 30))
+        return
+
+    results = [run_warm(*case, min_time=args.min_time) for case in cases()]
+    if not args.no_cold:
+        results += [run_cold("quote"), run_cold("contract")]
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print(results, baseline)
+
+    if args.output:
+        report = {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""Validate stored payloads in bulk, from the command line.
+
+    python bulk_validation.py --stage contract 'archive/**/*.jsonl' extra.json
+
+Inputs are files or glob patterns: ``.jsonl``/``.ndjson`` files hold one
+payload per line, any other file one JSON payload. Large JSONL files are
+split into byte ranges, so a single file is spread over every worker too.
+Each failing payload is written to stdout as one JSON line; progress and
+the final summary go to stderr. The exit status is 0 if every payload was
+valid, 1 if some were invalid, malformed or unreadable, 2 for bad usage.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from stages import STAGES, compile_stage
+from validation_errors import COLLECT_ALL, FAIL_FAST, MODES, error_limit, path_pattern
+
+JSONL_SUFFIXES = (".jsonl", ".ndjson")
+
+# Byte ranges of JSONL files given to one task; files of JSON payloads are
+# grouped by this many per task.
+RANGE_BYTES = 4 << 20
+FILES_PER_TASK = 256
+
+# Set in every worker by _init_worker.
+_validator = None
+_limit = None
+
+
+def _init_worker(schema, stage, limit):
+    global _validator, _limit
+    _validator = compile_stage(schema, stage)
+    _limit = limit
+
+
+def _check(data, failures, patterns, location):
+    """Validate one raw payload: "valid", "invalid" or "malformed".
+
+    Failures are added to ``failures``, their path patterns to ``patterns``.
+    """
+    try:
+        payload = json.loads(data)
+    except (ValueError, RecursionError) as e:
+        # RecursionError: nested deeper than json.loads can go.
+        failures.append(location + ("invalid JSON: %s" % e,))
+        return "malformed"
+    violations = _validator.errors(payload, _limit)
+    if not violations:
+        return "valid"
+    errors = []
+    for v in violations:
+        patterns[path_pattern(v.path)] += 1
+        errors.append({"path": v.json_path, "keyword": v.keyword, "message": v.message})
+    failures.append(location + (errors,))
+    return "invalid"
+
+
+def _lines(path, start, end):
+    """``(number, line)`` of the lines of ``path`` that start in ``[start, end)``.
+
+    Numbers count from 1 within the range.
+    """
+    with open(path, "rb") as f:
+        if start:
+            # The line running into ``start`` belongs to the previous range.
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        number = 0
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            number += 1
+            yield number, line
+
+
+def _run_task(task):
+    """Validate one task; returns ``(counts, failures, patterns, lines)``.
+
+    A task is ``("jsonl", path, start, end)`` or ``("json", paths)``.
+    Failures are ``(path, line, errors)`` with ``line`` relative to the
+    range (None for JSON files) and ``errors`` a list of violations or the
+    reason the payload could not be read; ``lines`` is the number of lines
+    in the range.
+    """
+    counts = Counter()
+    failures = []
+    patterns = Counter()
+    lines = 0
+    if task[0] == "jsonl":
+        _, path, start, end = task
+        try:
+            for lines, line in _lines(path, start, end):
+                if not line.strip():
+                    continue
+                counts["records"] += 1
+                counts[_check(line, failures, patterns, (path, lines))] += 1
+        except OSError as e:
+            counts["unreadable"] += 1
+            failures.append((path, None, "cannot read: %s" % e))
+    else:
+        for path in task[1]:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                counts["unreadable"] += 1
+                failures.append((path, None, "cannot read: %s" % e))
+                continue
+            counts["records"] += 1
+            counts[_check(data, failures, patterns, (path, None))] += 1
+    return counts, failures, patterns, lines
+
+
+def expand_inputs(patterns):
+    """Files named by ``patterns`` (paths or globs), each once, in order.
+
+    Raises ValueError for a pattern that matches nothing.
+    """
+    files = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or (
+            [pattern] if os.path.exists(pattern) else []
+        )
+        matches = [m for m in matches if os.path.isfile(m)]
+        if not matches:
+            raise ValueError("no files match %r" % pattern)
+        for match in matches:
+            if match not in seen:
+                seen.add(match)
+                files.append(match)
+    return files
+
+
+def tasks_for(files, range_bytes=RANGE_BYTES, files_per_task=FILES_PER_TASK):
+    """Split ``files`` into tasks for _run_task, in input order."""
+    batch = []
+    for path in files:
+        if not path.endswith(JSONL_SUFFIXES):
+            batch.append(path)
+            if len(batch) == files_per_task:
+                yield ("json", batch)
+                batch = []
+            continue
+        if batch:
+            yield ("json", batch)
+            batch = []
+        size = os.path.getsize(path)
+        for start in range(0, size, range_bytes):
+            yield ("jsonl", path, start, min(start + range_bytes, size))
+    if batch:
+        yield ("json", batch)
+
+
+class Progress:
+    """Running totals, with a status line on stderr at most every second."""
+
+    def __init__(self, stream, enabled):
+        self.stream = stream
+        self.enabled = enabled
+        self.counts = Counter()
+        self.patterns = Counter()
+        self.files = set()
+        self.start = self.shown = time.monotonic()
+        self.status_shown = False
+
+    def add(self, task, counts, patterns):
+        self.counts.update(counts)
+        self.patterns.update(patterns)
+        self.files.update([task[1]] if task[0] == "jsonl" else task[1])
+        now = time.monotonic()
+        if self.enabled and now - self.shown >= 1.0:
+            self.shown = now
+            self.status_shown = True
+            self.stream.write("\r" + self.status(now))
+            self.stream.flush()
+
+    def status(self, now):
+        seconds = max(now - self.start, 1e-9)
+        return "%d files, %d records, %d failed, %.0f records/s" % (
+            len(self.files),
+            self.counts["records"],
+            self.counts["invalid"] + self.counts["malformed"],
+            self.counts["records"] / seconds,
+        )
+
+    def summary(self, top=10):
+        if self.status_shown:
+            self.stream.write("\r" + " " * 79 + "\r")
+        seconds = time.monotonic() - self.start
+        lines = ["%-10s %12d" % ("files", len(self.files))]
+        for key in ("records", "valid", "invalid", "malformed", "unreadable"):
+            lines.append("%-10s %12d" % (key, self.counts[key]))
+        lines.append(
+            "%-10s %12.1f  (%.0f records/s)"
+            % ("seconds", seconds, self.counts["records"] / max(seconds, 1e-9))
+        )
+        if self.patterns:
+            lines.append("most frequent violations:")
+            for pattern, count in self.patterns.most_common(top):
+                lines.append("%12d  %s" % (count, pattern))
+        self.stream.write("\n".join(lines) + "\n")
+
+
+def validate_files(
+    files,
+    schema,
+    stage,
+    output=sys.stdout,
+    workers=None,
+    mode=FAIL_FAST,
+    max_errors=100,
+    progress=None,
+):
+    """Validate every ``stage`` payload in ``files``; returns the total counts.
+
+    Failures are written to the text stream ``output`` as JSON lines.
+    ``workers=1`` validates in this process; otherwise a process pool of
+    ``workers`` (default: one per CPU) does. ``progress`` is a Progress.
+    """
+    limit = error_limit(mode, max_errors)
+    workers = workers or os.cpu_count() or 1
+    progress = progress or Progress(sys.stderr, False)
+    tasks = tasks_for(files)
+    if workers == 1:
+        _init_worker(schema, stage, limit)
+        pool = None
+        results = ((task, _run_task(task)) for task in tasks)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        pool = ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(schema, stage, limit)
+        )
+        tasks = list(tasks)
+        results = zip(tasks, pool.map(_run_task, tasks))
+    # Lines of each JSONL file before the range being reported; ranges of
+    # a file come back in order.
+    line_base = Counter()
+    try:
+        for task, (counts, failures, patterns, lines) in results:
+            for path, line, errors in failures:
+                record = {"file": path}
+                if line is not None:
+                    record["line"] = line_base[path] + line
+                record["valid"] = False
+                record["error" if isinstance(errors, str) else "errors"] = errors
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if task[0] == "jsonl":
+                line_base[task[1]] += lines
+            progress.add(task, counts, patterns)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return progress.counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Validate JSON and JSONL payload files against a schema."
+    )
+    parser.add_argument("inputs", nargs="+", help="files or glob patterns")
+    parser.add_argument(
+        "--schema", help="schema file (default: the current insurance schema)"
+    )
+    parser.add_argument(
+        "--stage", choices=STAGES, required=True, help="stage of the payloads"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--mode", choices=MODES, default=FAIL_FAST)
+    parser.add_argument("--max-errors", type=int, default=100)
+    parser.add_argument("--output", "-o", default="-", help="failures (JSONL)")
+    parser.add_argument(
+        "--progress",
+        action=argparse.BooleanOptionalAction,
+        default=sys.stderr.isatty(),
+    )
+    args = parser.parse_args(argv)
+    if args.mode == COLLECT_ALL and args.max_errors < 1:
+        parser.error("--max-errors must be positive")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    try:
+        files = expand_inputs(args.inputs)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        if args.schema is None:
+            from schema_registry import load_schema
+
+            schema = load_schema("insurance")
+        else:
+            with open(args.schema, encoding="utf-8") as f:
+                schema = json.load(f)
+    except (OSError, ValueError) as e:
+        parser.error("cannot load the schema: %s" % e)
+
+    if args.output == "-":
+        output = sys.stdout
+    else:
+        # Records are written with ensure_ascii=False.
+        output = open(args.output, "w", encoding="utf-8")
+    progress = Progress(sys.stderr, args.progress)
+    try:
+        counts = validate_files(
+            files,
+            schema,
+            args.stage,
+            output,
+            args.workers,
+            args.mode,
+            args.max_errors,
+            progress,
+        )
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    progress.summary()
+    failed = counts["invalid"] + counts["malformed"] + counts["unreadable"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+import re
+from json import JSONDecodeError
+from json.decoder import scanstring
+
+from jsonschema import ValidationError
+
+from codegen_validator import compile_validator
+from schema_flattener import flatten_schema
+from schema_validator import SharedCache, schema_hash
+
+_TOKEN = re.compile(
+    r"[ \t\n\r]*(?:"
+    r'(")'
+    r"|([{}\[\],:])"
+    r"|(-?(?:0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?)"
+    r"|(true|false|null)"
+    r")"
+)
+_LITERALS = {"true": True, "false": False, "null": None}
+
+# Parser states.
+_VALUE, _ARRAY_FIRST, _OBJECT_FIRST, _KEY, _COLON, _AFTER_VALUE = range(6)
+
+
+def iter_events(text):
+    """Parse a JSON document incrementally, yielding ``(event, value)`` pairs.
+
+    Events are ``start_map``, ``map_key``, ``end_map``, ``start_array``,
+    ``end_array`` and the scalars ``string``, ``number``, ``boolean`` and
+    ``null``. Nothing past the current token is looked at until the
+    consumer asks for the next event. Malformed input raises
+    ``json.JSONDecodeError``, like ``json.loads``.
+    """
+    match = _TOKEN.match
+    stack = []
+    state = _VALUE
+    pos = 0
+    while True:
+        m = match(text, pos)
+        if m is None:
+            rest = len(text) - len(text[pos:].lstrip(" \t\n\r"))
+            if state == _AFTER_VALUE and not stack and rest == len(text):
+                return
+            if state == _AFTER_VALUE and not stack:
+                raise JSONDecodeError("Extra data", text, rest)
+            raise JSONDecodeError("Expecting value", text, rest)
+        quote, punct, number, frac, exp, literal = m.groups()
+        start, pos = m.start(m.lastindex), m.end()
+
+        if state == _VALUE or state == _ARRAY_FIRST:
+            if quote:
+                value, pos = scanstring(text, pos)
+                yield "string", value
+                state = _AFTER_VALUE
+            elif number:
+                yield "number", float(number) if frac or exp else int(number)
+                state = _AFTER_VALUE
+            elif literal:
+                value = _LITERALS[literal]
+                yield "null" if value is None else "boolean", value
+                state = _AFTER_VALUE
+            elif punct == "{":
+                stack.append("{")
+                yield "start_map", None
+                state = _OBJECT_FIRST
+            elif punct == "[":
+                stack.append("[")
+                yield "start_array", None
+                state = _ARRAY_FIRST
+            elif punct == "]" and state == _ARRAY_FIRST:
+                stack.pop()
+                yield "end_array", None
+                state = _AFTER_VALUE
+            else:
+                raise JSONDecodeError("Expecting value", text, start)
+        elif state == _OBJECT_FIRST or state == _KEY:
+            if quote:
+                value, pos = scanstring(text, pos)
+                yield "map_key", value
+                state = _COLON
+            elif punct == "}" and state == _OBJECT_FIRST:
+                stack.pop()
+                yield "end_map", None
+                state = _AFTER_VALUE
+            else:
+                raise JSONDecodeError(
+                    "Expecting property name enclosed in double quotes", text, start
+                )
+        elif state == _COLON:
+            if punct != ":":
+                raise JSONDecodeError("Expecting ':' delimiter", text, start)
+            state = _VALUE
+        else:
+            if not stack:
+                raise JSONDecodeError("Extra data", text, start)
+            if punct == ",":
+                state = _KEY if stack[-1] == "{" else _VALUE
+            elif punct == "}" and stack[-1] == "{":
+                stack.pop()
+                yield "end_map", None
+            elif punct == "]" and stack[-1] == "[":
+                stack.pop()
+                yield "end_array", None
+            else:
+                raise JSONDecodeError("Expecting ',' delimiter", text, start)
+
+
+# Asserting keywords that are not checked event by event (those are type,
+# properties, required, additionalProperties, items and allOf). A subschema
+# using any of these is checked once its value has been fully parsed.
+_DEFERRED = frozenset(
+    ["enum", "const", "anyOf", "oneOf", "not", "prefixItems", "contains"]
+    + ["minLength", "maxLength", "pattern", "minimum", "maximum", "multipleOf"]
+    + ["exclusiveMinimum", "exclusiveMaximum", "minItems", "maxItems"]
+    + ["uniqueItems", "minProperties", "maxProperties", "patternProperties"]
+    + ["propertyNames", "dependentRequired", "dependentSchemas", "if"]
+    + ["unevaluatedItems", "unevaluatedProperties", "$ref", "$dynamicRef"]
+)
+
+
+class _Node:
+    __slots__ = (
+        "schema",
+        "types",
+        "required",
+        "properties",
+        "additional",
+        "items",
+        "deferred",
+        "false",
+    )
+
+
+def _json_type_matches(types, kind, value):
+    if kind in types:
+        return True
+    if kind == "number":
+        # JSON numbers carry no int/float distinction: 1.0 is an integer.
+        return "integer" in types and (isinstance(value, int) or value.is_integer())
+    return False
+
+
+class StreamingValidator:
+    """Validates a JSON document while it is being parsed.
+
+    Built from the flattened schema: ``type``, ``properties``, ``required``,
+    ``additionalProperties``, ``items`` and ``allOf`` are checked event by
+    event; subschemas using other keywords are checked with the regular
+    validator as soon as their value is complete. With ``fail_fast`` the
+    first violation stops parsing, so the rest of the input is never read.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.hash = schema_hash(schema)
+        self._nodes = {}
+        self._deferred = {}
+        try:
+            self._root = self._compile(flatten_schema(schema))
+        except ValueError:
+            # Recursive schemas cannot be flattened: parse the whole document
+            # and validate it afterwards.
+            node = self._new_node(schema)
+            node.deferred = True
+            self._root = [node]
+
+    @staticmethod
+    def _new_node(schema):
+        node = _Node()
+        node.schema = schema
+        node.false = schema is False
+        node.deferred = False
+        node.types = node.required = node.properties = None
+        node.additional = node.items = None
+        return node
+
+    def _compile(self, schema):
+        """Expand ``schema`` into the list of nodes that must all hold."""
+        if schema is True:
+            return []
+        key = id(schema)
+        if key in self._nodes:
+            return self._nodes[key]
+        nodes = self._nodes[key] = []
+        node = self._new_node(schema)
+        if isinstance(schema, dict):
+            if _DEFERRED.intersection(schema):
+                node.deferred = True
+            else:
+                types = schema.get("type")
+                if types is not None:
+                    node.types = frozenset([types] if isinstance(types, str) else types)
+                if schema.get("required"):
+                    node.required = schema["required"]
+                if "properties" in schema:
+                    node.properties = {
+                        name: self._compile(sub)
+                        for name, sub in schema["properties"].items()
+                    }
+                if "additionalProperties" in schema:
+                    node.additional = self._compile(schema["additionalProperties"])
+                if "items" in schema:
+                    node.items = self._compile(schema["items"])
+                for sub in schema.get("allOf", ()):
+                    nodes.extend(self._compile(sub))
+        nodes.append(node)
+        return nodes
+
+    def _check_deferred(self, nodes, value, path, errors):
+        for node in nodes:
+            if node.deferred:
+                validator = self._deferred.get(id(node))
+                if validator is None:
+                    validator = self._deferred[id(node)] = compile_validator(
+                        node.schema
+                    )
+                try:
+                    validator.validate(value)
+                except ValidationError as error:
+                    error.path.extendleft(reversed(path))
+                    if not errors:
+                        errors.append(error)
+
+    def validate(self, data, fail_fast=True):
+        """Parse and validate ``data`` (bytes, memoryview or str).
+
+        Returns the parsed document. Raises ``jsonschema.ValidationError``
+        for the first violation found and ``json.JSONDecodeError`` for
+        malformed input; without ``fail_fast`` the whole document is parsed
+        before the first violation is raised.
+        """
+        if not isinstance(data, str):
+            data = bytes(data).decode("utf-8")
+        errors = []
+
+        def violation(message, keyword, path):
+            error = ValidationError(message, validator=keyword, path=path)
+            if fail_fast:
+                raise error
+            if not errors:
+                # Only the first violation is raised; keep nothing else.
+                errors.append(error)
+
+        def child_nodes(frame, key):
+            nodes = []
+            for node in frame[2]:
+                if node.properties is not None and key in node.properties:
+                    nodes.extend(node.properties[key])
+                elif node.additional is not None:
+                    nodes.extend(node.additional)
+            return nodes
+
+        def start_value(nodes, kind, value, path):
+            # Containers are still empty here: describe them by kind.
+            shown = "an %s" % kind if kind in ("object", "array") else repr(value)
+            for node in nodes:
+                if node.false:
+                    violation("False schema does not allow %s" % shown, "false", path)
+                elif node.types is not None and not _json_type_matches(
+                    node.types, kind, value
+                ):
+                    violation(
+                        "%s is not of type %s"
+                        % (shown, ", ".join(map(repr, sorted(node.types)))),
+                        "type",
+                        path,
+                    )
+
+        # Frame: [container, pending key, nodes, path, deferred nodes]
+        stack = []
+        root = None
+        nodes = self._root
+        for event, value in iter_events(data):
+            if stack:
+                frame = stack[-1]
+                if event == "map_key":
+                    frame[1] = value
+                    continue
+                if event == "end_map" or event == "end_array":
+                    stack.pop()
+                    container, _, frame_nodes, path, deferred = frame
+                    if event == "end_map":
+                        for node in frame_nodes:
+                            if node.required is not None:
+                                for name in node.required:
+                                    if name not in container:
+                                        violation(
+                                            "%r is a required property" % name,
+                                            "required",
+                                            path,
+                                        )
+                    if deferred:
+                        self._check_deferred(deferred, container, path, errors)
+                        if errors and fail_fast:
+                            raise errors[0]
+                    value = container
+                    if not stack:
+                        root = value
+                        continue
+                    frame = stack[-1]
+                    self._attach(frame, value)
+                    continue
+                if isinstance(frame[0], dict):
+                    key = frame[1]
+                    nodes = child_nodes(frame, key)
+                else:
+                    key = len(frame[0])
+                    nodes = [n for node in frame[2] if node.items for n in node.items]
+                path = frame[3] + (key,)
+            else:
+                path = ()
+
+            if event == "start_map" or event == "start_array":
+                container = {} if event == "start_map" else []
+                kind = "object" if event == "start_map" else "array"
+                start_value(nodes, kind, container, path)
+                deferred = [node for node in nodes if node.deferred]
+                if deferred:
+                    # Checked as a whole once complete; children are free.
+                    nodes = [node for node in nodes if not node.deferred]
+                stack.append([container, None, nodes, path, deferred])
+                continue
+
+            kind = "string" if event == "string" else event
+            start_value(nodes, kind, value, path)
+            self._check_deferred(nodes, value, path, errors)
+            if errors and fail_fast:
+                raise errors[0]
+            if stack:
+                self._attach(stack[-1], value)
+            else:
+                root = value
+
+        if errors:
+            raise errors[0]
+        return root
+
+    @staticmethod
+    def _attach(frame, value):
+        container = frame[0]
+        if isinstance(container, dict):
+            container[frame[1]] = value
+        else:
+            container.append(value)
+
+
+_streaming = SharedCache()
+
+
+def compile_streaming(schema):
+    """Return the shared StreamingValidator for ``schema``, building it once."""
+    return _streaming.get(schema_hash(schema), lambda: StreamingValidator(schema))
@@ -0,0 +1,646 @@
+import re
+from urllib.parse import unquote
+
+import validator_cache
+from schema_validator import SharedCache, compile_schema, schema_hash
+from validation_errors import (
+    ErrorCollector,
+    ErrorLimitReached,
+    InternTable,
+    title_index,
+)
+
+# jsonschema and the flattener (jsonref, requests) are imported where they
+# are used: a validator loaded from validator_cache needs neither, and
+# neither does validating a payload with it.
+
+# Keywords the generator translates into Python. Any other keyword that
+# jsonschema would assert on makes generation fail instead of silently
+# producing a more permissive validator; keywords jsonschema ignores
+# (``titles``, ``definitions``, ``format`` without a checker, ...) are
+# ignored here too.
+SUPPORTED_KEYWORDS = frozenset(
+    [
+        "$ref",
+        "type",
+        "properties",
+        "required",
+        "additionalProperties",
+        "items",
+        "enum",
+        "const",
+        "allOf",
+        "anyOf",
+        "oneOf",
+        "not",
+        "format",
+    ]
+)
+
+
+def _asserting_keywords():
+    from jsonschema.validators import Draft202012Validator
+
+    return frozenset(Draft202012Validator.VALIDATORS) | {"$id"}
+
+
+_TYPE_CHECKS = {
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+    "string": "isinstance({v}, str)",
+    "boolean": "isinstance({v}, bool)",
+    "null": "{v} is None",
+    "number": "isinstance({v}, _Number) and not isinstance({v}, bool)",
+    "integer": (
+        "isinstance({v}, int) and not isinstance({v}, bool)"
+        " or isinstance({v}, float) and {v}.is_integer()"
+    ),
+}
+
+# Plain leaves: subschemas asserting nothing but one of these types. The
+# generated code checks them as ``isinstance(v.get(key, default), str)``,
+# one call per key, the default (of the right type) standing in for a
+# missing key; see object_body.
+_LEAF_DEFAULTS = {"string": "''", "boolean": "False", "null": "None"}
+
+_HEADER = """\
+from numbers import Number as _Number
+
+from codegen_validator import json_equal as _equal, memoized_call as _memo
+
+_MISSING = object()
+"""
+
+
+def json_equal(one, two):
+    # JSON equality as jsonschema defines it for enum/const: True != 1.
+    if one is two:
+        return True
+    if isinstance(one, str) or isinstance(two, str):
+        return one == two
+    if isinstance(one, list) and isinstance(two, list):
+        return len(one) == len(two) and all(map(json_equal, one, two))
+    if isinstance(one, dict) and isinstance(two, dict):
+        return one.keys() == two.keys() and all(
+            json_equal(one[key], two[key]) for key in one
+        )
+    if isinstance(one, bool) or isinstance(two, bool):
+        return isinstance(one, bool) and isinstance(two, bool) and one == two
+    return one == two
+
+
+def memoized_call(fn, v, memo):
+    # Within one validation run, a container object already checked against
+    # the same subschema function is not walked again.
+    if not isinstance(v, (dict, list)):
+        return fn(v, memo)
+    key = (fn, id(v))
+    result = memo.get(key)
+    if result is None:
+        result = memo[key] = fn(v, memo)
+    return result
+
+
+def _escape_pointer(token):
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def resolve_pointer(schema, pointer):
+    if pointer == "#":
+        return schema
+    if not pointer.startswith("#/"):
+        raise ValueError("only local '#/...' references are supported: %r" % pointer)
+    node = schema
+    for token in pointer[2:].split("/"):
+        token = unquote(token).replace("~1", "/").replace("~0", "~")
+        if isinstance(node, list):
+            token = int(token)
+        node = node[token]
+    return node
+
+
+class _Generator:
+    def __init__(self, schema, memoize=False):
+        self.schema = schema
+        self.memoize = memoize
+        self.functions = {}
+        self.constants = {}
+        self.pending = []
+        self.error_functions = {}
+        self.error_pending = []
+        self.lines = []
+        self.asserting = _asserting_keywords()
+
+    def function_for(self, pointer, name=None):
+        if pointer not in self.functions:
+            if name is None:
+                name = "_s%d" % len(self.functions)
+            self.functions[pointer] = name
+            self.pending.append(pointer)
+        return self.functions[pointer]
+
+    def error_function_for(self, pointer, name=None):
+        if pointer not in self.error_functions:
+            if name is None:
+                name = "_e%d" % len(self.error_functions)
+            self.error_functions[pointer] = name
+            self.error_pending.append(pointer)
+        return self.error_functions[pointer]
+
+    def call(self, fn, v, ref=False):
+        """Expression calling boolean function ``fn`` from a boolean one."""
+        if not self.memoize:
+            return "%s(%s)" % (fn, v)
+        if ref:
+            return "_memo(%s, %s, memo)" % (fn, v)
+        return "%s(%s, memo)" % (fn, v)
+
+    def error_call(self, fn, v):
+        """Expression calling boolean function ``fn`` from an error one."""
+        return "%s(%s, {})" % (fn, v) if self.memoize else "%s(%s)" % (fn, v)
+
+    def keyword(self, keyword, pointer, lines):
+        """Hook around the lines checking ``keyword``; see profiling."""
+        return lines
+
+    def constant(self, value):
+        name = "_C%d" % len(self.constants)
+        self.constants[name] = value
+        return name
+
+    def generate(self):
+        self.function_for("#", "_validate" if self.memoize else "validate")
+        definitions = {}
+        root = self.schema if isinstance(self.schema, dict) else {}
+        for container in ("definitions", "$defs"):
+            for name in root.get(container, {}):
+                pointer = "#/%s/%s" % (container, _escape_pointer(name))
+                # ASCII only: Python folds other identifiers with NFKC, so
+                # distinct names could end up naming the same function.
+                ident = "def_" + re.sub(r"[^0-9A-Za-z_]", "_", name)
+                while ident in self.functions.values():
+                    ident += "_"
+                definitions[name] = self.function_for(pointer, ident)
+        self.error_function_for("#", "errors")
+        # Error functions may ask for more boolean ones (anyOf, not, ...).
+        while self.pending or self.error_pending:
+            if self.pending:
+                self.emit_function(self.pending.pop(0))
+            else:
+                self.emit_error_function(self.error_pending.pop(0))
+
+        out = [_HEADER]
+        out.extend("%s = %r" % item for item in self.constants.items())
+        out.extend(self.lines)
+        out.append("")
+        if self.memoize:
+            # Public entry points start a fresh memo for every run.
+            out.append("")
+            out.append("def validate(v):")
+            out.append("    return _validate(v, {})")
+            out.append("")
+            out.append("")
+            out.append("DEFINITIONS = {")
+            out.extend(
+                "    %r: lambda v: %s(v, {})," % item for item in definitions.items()
+            )
+        else:
+            out.append("DEFINITIONS = {")
+            out.extend("    %r: %s," % item for item in definitions.items())
+        out.append("}")
+        return "\n".join(out) + "\n"
+
+    def emit_function(self, pointer):
+        self.counter = 0
+        body = self.body(resolve_pointer(self.schema, pointer), "v", pointer)
+        self.lines.append("")
+        self.lines.append("")
+        params = "v, memo" if self.memoize else "v"
+        self.lines.append("def %s(%s):" % (self.functions[pointer], params))
+        # repr(): the pointer holds property and definition names, which
+        # may contain newlines or anything else.
+        self.lines.append("    # %r" % pointer)
+        self.lines.extend("    " + line for line in body)
+        self.lines.append("    return True")
+
+    def emit_error_function(self, pointer):
+        # One function per subschema, so an early "return" ends just that
+        # subschema; reports go to the collector passed as ``report``.
+        body = self.error_body(resolve_pointer(self.schema, pointer), pointer)
+        self.lines.append("")
+        self.lines.append("")
+        self.lines.append("def %s(v, path, report):" % self.error_functions[pointer])
+        self.lines.append("    # %r" % pointer)
+        self.lines.extend("    " + line for line in body or ["pass"])
+
+    def error_body(self, schema, pointer):
+        if schema is True:
+            return []
+        if schema is False:
+            return ["report(path, 'false', %r, v)" % pointer]
+
+        lines = []
+        if "$ref" in schema:
+            lines.append(
+                "%s(v, path, report)" % self.error_function_for(schema["$ref"])
+            )
+
+        types = schema.get("type")
+        if types is not None:
+            expected = self.constant(types)
+            types = [types] if isinstance(types, str) else list(types)
+            check = " or ".join(_TYPE_CHECKS[t].format(v="v") for t in types)
+            lines.append("if not (%s):" % check)
+            lines.append(
+                "    report(path, 'type', %r, v, %s)" % (pointer + "/type", expected)
+            )
+            lines.append("    return")
+
+        if "const" in schema:
+            const = self.constant(schema["const"])
+            lines.append(
+                "if not _equal(v, %s): report(path, 'const', %r, v, %s)"
+                % (const, pointer + "/const", const)
+            )
+        if "enum" in schema:
+            enum = self.constant(list(schema["enum"]))
+            lines.append(
+                "if not any(_equal(v, e) for e in %s): report(path, 'enum', %r, v, %s)"
+                % (enum, pointer + "/enum", enum)
+            )
+
+        for index in range(len(schema.get("allOf", ()))):
+            sub = "%s/allOf/%d" % (pointer, index)
+            lines.append("%s(v, path, report)" % self.error_function_for(sub))
+        if "anyOf" in schema:
+            calls = [
+                self.error_call(self.function_for("%s/anyOf/%d" % (pointer, i)), "v")
+                for i in range(len(schema["anyOf"]))
+            ]
+            lines.append(
+                "if not (%s): report(path, 'anyOf', %r, v)"
+                % (" or ".join(calls), pointer + "/anyOf")
+            )
+        if "oneOf" in schema:
+            calls = [
+                self.error_call(self.function_for("%s/oneOf/%d" % (pointer, i)), "v")
+                for i in range(len(schema["oneOf"]))
+            ]
+            lines.append(
+                "if [%s].count(True) != 1: report(path, 'oneOf', %r, v)"
+                % (", ".join(calls), pointer + "/oneOf")
+            )
+        if "not" in schema:
+            fn = self.function_for(pointer + "/not")
+            lines.append(
+                "if %s: report(path, 'not', %r, v, %s)"
+                % (
+                    self.error_call(fn, "v"),
+                    pointer + "/not",
+                    self.constant(schema["not"]),
+                )
+            )
+
+        # A failed "type" already returned, so a pinned type needs no guard.
+        lines.extend(
+            self.guarded(types, "object", "v", self.object_errors(schema, pointer))
+        )
+        lines.extend(
+            self.guarded(types, "array", "v", self.array_errors(schema, pointer))
+        )
+        return lines
+
+    def object_errors(self, schema, pointer):
+        lines = []
+        required = schema.get("required")
+        if required:
+            names = self.constant(frozenset(required))
+            ordered = self.constant(tuple(required))
+            lines.append("if not %s <= v.keys():" % names)
+            lines.append("    for k in %s:" % ordered)
+            lines.append(
+                "        if k not in v: report(path, 'required', %r, v, k)"
+                % (pointer + "/required")
+            )
+        properties = schema.get("properties", {})
+        for name, sub in properties.items():
+            sub_pointer = "%s/properties/%s" % (pointer, _escape_pointer(name))
+            if sub is True or not (sub is False or set(sub) & self.asserting):
+                continue
+            if sub is False:
+                lines.append(
+                    "if %r in v: report(path + (%r,), 'false', %r, v[%r])"
+                    % (name, name, sub_pointer, name)
+                )
+                continue
+            lines.append("w = v.get(%r, _MISSING)" % name)
+            lines.append(
+                "if w is not _MISSING: %s(w, path + (%r,), report)"
+                % (self.error_function_for(sub_pointer), name)
+            )
+        additional = schema.get("additionalProperties", True)
+        if additional is not True:
+            known = self.constant(frozenset(properties))
+            lines.append("for k, w in v.items():")
+            lines.append("    if k not in %s:" % known)
+            if additional is False:
+                lines.append(
+                    "        report(path, 'additionalProperties', %r, v, k)"
+                    % (pointer + "/additionalProperties")
+                )
+            else:
+                fn = self.error_function_for(pointer + "/additionalProperties")
+                lines.append("        %s(w, path + (k,), report)" % fn)
+        return lines
+
+    def array_errors(self, schema, pointer):
+        if "items" not in schema or schema["items"] is True:
+            return []
+        if schema["items"] is False:
+            return ["if v: report(path, 'items', %r, v)" % (pointer + "/items")]
+        fn = self.error_function_for(pointer + "/items")
+        return [
+            "for i, w in enumerate(v):",
+            "    %s(w, path + (i,), report)" % fn,
+        ]
+
+    def var(self):
+        self.counter += 1
+        return "v%d" % self.counter
+
+    def body(self, schema, v, pointer):
+        if schema is True:
+            return []
+        if schema is False:
+            return ["return False"]
+        if not isinstance(schema, dict):
+            raise ValueError("invalid subschema at %s" % pointer)
+        unsupported = (set(schema) & self.asserting) - SUPPORTED_KEYWORDS
+        if unsupported:
+            raise ValueError(
+                "unsupported keyword(s) %s at %s"
+                % (", ".join(sorted(unsupported)), pointer)
+            )
+
+        lines = []
+        if "$ref" in schema:
+            # Draft 2020-12: keywords next to $ref still apply.
+            resolve_pointer(self.schema, schema["$ref"])
+            check = "if not %s: return False" % self.call(
+                self.function_for(schema["$ref"]), v, ref=True
+            )
+            lines.extend(self.keyword("$ref", schema["$ref"], [check]))
+
+        types = schema.get("type")
+        if types is not None:
+            types = [types] if isinstance(types, str) else list(types)
+            check = " or ".join(_TYPE_CHECKS[t].format(v=v) for t in types)
+            if " " in check.replace(", ", ""):
+                check = "(%s)" % check
+            check = "if not %s: return False" % check
+            lines.extend(self.keyword("type", pointer + "/type", [check]))
+
+        if "const" in schema:
+            const = self.constant(schema["const"])
+            check = "if not _equal(%s, %s): return False" % (v, const)
+            lines.extend(self.keyword("const", pointer + "/const", [check]))
+        if "enum" in schema:
+            enum = self.constant(list(schema["enum"]))
+            check = "if not any(_equal(%s, e) for e in %s): return False" % (v, enum)
+            lines.extend(self.keyword("enum", pointer + "/enum", [check]))
+
+        all_of = []
+        for index, sub in enumerate(schema.get("allOf", ())):
+            all_of.extend(self.body(sub, v, "%s/allOf/%d" % (pointer, index)))
+        lines.extend(self.keyword("allOf", pointer + "/allOf", all_of))
+        if "anyOf" in schema:
+            calls = [
+                self.call(self.function_for("%s/anyOf/%d" % (pointer, i)), v)
+                for i in range(len(schema["anyOf"]))
+            ]
+            check = "if not (%s): return False" % " or ".join(calls)
+            lines.extend(self.keyword("anyOf", pointer + "/anyOf", [check]))
+        if "oneOf" in schema:
+            calls = [
+                self.call(self.function_for("%s/oneOf/%d" % (pointer, i)), v)
+                for i in range(len(schema["oneOf"]))
+            ]
+            check = "if [%s].count(True) != 1: return False" % ", ".join(calls)
+            lines.extend(self.keyword("oneOf", pointer + "/oneOf", [check]))
+        if "not" in schema:
+            fn = self.function_for(pointer + "/not")
+            check = "if %s: return False" % self.call(fn, v)
+            lines.extend(self.keyword("not", pointer + "/not", [check]))
+
+        lines.extend(
+            self.guarded(types, "object", v, self.object_body(schema, v, pointer))
+        )
+        lines.extend(
+            self.guarded(types, "array", v, self.array_body(schema, v, pointer))
+        )
+        return lines
+
+    def guarded(self, types, kind, v, body):
+        # Object/array keywords only apply to instances of that kind; skip the
+        # isinstance guard when ``type`` already pinned the instance down.
+        if not body:
+            return []
+        if types == [kind]:
+            return body
+        return ["if %s:" % _TYPE_CHECKS[kind].format(v=v)] + [
+            "    " + line for line in body
+        ]
+
+    def object_body(self, schema, v, pointer):
+        lines = []
+        required = schema.get("required")
+        if required:
+            names = self.constant(frozenset(required))
+            check = "if not %s <= %s.keys(): return False" % (names, v)
+            lines.extend(self.keyword("required", pointer + "/required", [check]))
+        properties = schema.get("properties", {})
+        checks = []
+        for name, sub in properties.items():
+            sub_pointer = "%s/properties/%s" % (pointer, _escape_pointer(name))
+            if sub is False:
+                checks.append("if %r in %s: return False" % (name, v))
+                continue
+            leaf = self.leaf_type(sub)
+            if leaf is not None:
+                value = "%s.get(%r, %s)" % (v, name, _LEAF_DEFAULTS[leaf])
+                check = "if not %s: return False" % _TYPE_CHECKS[leaf].format(v=value)
+                checks.extend(self.keyword("type", sub_pointer + "/type", [check]))
+                continue
+            w = self.var()
+            body = self.body(sub, w, sub_pointer)
+            if body:
+                checks.append("%s = %s.get(%r, _MISSING)" % (w, v, name))
+                checks.append("if %s is not _MISSING:" % w)
+                checks.extend("    " + line for line in body)
+        lines.extend(self.keyword("properties", pointer + "/properties", checks))
+        additional = schema.get("additionalProperties", True)
+        pointer += "/additionalProperties"
+        if additional is False:
+            known = self.constant(frozenset(properties))
+            check = "if not %s.keys() <= %s: return False" % (v, known)
+            lines.extend(self.keyword("additionalProperties", pointer, [check]))
+        elif additional is not True:
+            k, w = self.var(), self.var()
+            body = self.body(additional, w, pointer)
+            if body:
+                known = self.constant(frozenset(properties))
+                checks = ["for %s, %s in %s.items():" % (k, w, v)]
+                checks.append("    if %s not in %s:" % (k, known))
+                checks.extend("        " + line for line in body)
+                lines.extend(self.keyword("additionalProperties", pointer, checks))
+        return lines
+
+    def leaf_type(self, schema):
+        """The type of a plain leaf subschema (see _LEAF_DEFAULTS), else None.
+
+        Most properties of the insurance schema are ``{"type": "string"}``
+        plus annotations. body() would bind each value, compare it with
+        _MISSING and branch; the single call is about a third faster per
+        leaf (see benchmarks/bench_leaves.py).
+        """
+        if not isinstance(schema, dict) or set(schema) & self.asserting != {"type"}:
+            return None
+        leaf = schema["type"]
+        return leaf if isinstance(leaf, str) and leaf in _LEAF_DEFAULTS else None
+
+    def array_body(self, schema, v, pointer):
+        if "items" not in schema:
+            return []
+        if schema["items"] is False:
+            return ["if %s: return False" % v]
+        w = self.var()
+        body = self.body(schema["items"], w, pointer + "/items")
+        if not body:
+            return []
+        loop = ["for %s in %s:" % (w, v)] + ["    " + line for line in body]
+        return self.keyword("items", pointer + "/items", loop)
+
+
+def generate_source(schema, memoize=False):
+    """Translate ``schema`` into the source of a Python validation module.
+
+    The module defines ``validate(instance) -> bool`` for the root schema and
+    one ``def_<name>`` function per entry of ``definitions``/``$defs``,
+    collected in ``DEFINITIONS``, plus ``errors(instance, path, report)``,
+    which calls ``report`` for every violation (see ErrorCollector). Raises
+    ValueError for schemas using keywords or references the generator does
+    not handle.
+
+    With ``memoize``, every ``$ref`` call remembers its verdict per instance
+    object for the rest of the run (see ``memoized_call``).
+    """
+    from jsonschema.validators import Draft202012Validator, validator_for
+
+    if validator_for(schema) is not Draft202012Validator:
+        raise ValueError("code generation only supports draft 2020-12 schemas")
+    return _Generator(schema, memoize).generate()
+
+
+class CodegenValidator:
+    """Validator backed by Python functions generated from the schema.
+
+    ``is_valid`` runs only the generated code. So does ``validate``, which
+    raises PayloadInvalid, a ``jsonschema.ValidationError`` built lazily
+    from the first violation found; ``errors`` returns an ErrorReport.
+    Either renders user-facing messages with ``localized(locale)``, from
+    the schema's ``titles`` indexed at compile time.
+
+    By default the code is generated from the flattened schema, with every
+    definition inlined where it is used. ``memoize=True`` keeps the
+    definitions as functions instead and remembers, within one run, which
+    payload objects each of them already accepted or rejected: an
+    ``address`` or ``person`` dict referenced from several places of the
+    same payload is then checked once.
+
+    The generated code is cached on disk by schema hash (validator_cache),
+    so later processes skip the metaschema check, flattening and code
+    generation for a schema they have already seen.
+    """
+
+    def __init__(self, schema, memoize=False):
+        self.schema = schema
+        self.hash = schema_hash(schema)
+        cached = validator_cache.load(self.hash, memoize)
+        if cached is not None:
+            # Only schemas that passed every check below were cached.
+            self.source, code, self.titles = cached
+        else:
+            from jsonschema.validators import validator_for
+
+            from schema_flattener import flatten_schema
+
+            validator_for(schema).check_schema(schema)
+            if memoize:
+                target = schema
+            else:
+                try:
+                    target = flatten_schema(schema)
+                except ValueError:
+                    target = schema
+            self.source = generate_source(target, memoize)
+            self.titles = title_index(target)
+            try:
+                code = compile(self.source, "<schema %s>" % self.hash[:12], "exec")
+            except SyntaxError as e:
+                # A generator bug; compile_validator falls back to jsonschema.
+                raise ValueError("generated code does not compile: %s" % e) from e
+            validator_cache.store(self.hash, memoize, self.source, code, self.titles)
+        namespace = {"__name__": "schema_%s" % self.hash[:12]}
+        exec(code, namespace)
+        self.is_valid = namespace["validate"]
+        self.definitions = namespace["DEFINITIONS"]
+        self._errors = namespace["errors"]
+        # The schema pointers of this validator's ErrorReports.
+        self.pointers = InternTable()
+
+    def validate(self, instance):
+        if not self.is_valid(instance):
+            from payload_invalid import PayloadInvalid
+
+            raise PayloadInvalid(self.errors(instance, 1))
+
+    def errors(self, instance, limit=None):
+        """Return up to ``limit`` violations of ``instance`` (empty if valid).
+
+        The violations come as an ErrorReport, a sequence of Violations.
+        """
+        if self.is_valid(instance):
+            return []
+        collector = ErrorCollector(limit, self.titles, self.pointers)
+        try:
+            self._errors(instance, (), collector)
+        except ErrorLimitReached:
+            pass
+        return collector.violations
+
+
+_generated = SharedCache()
+
+
+def compile_codegen(schema, memoize=False):
+    """Return the shared CodegenValidator for ``schema``, generating it once."""
+    key = (schema_hash(schema), memoize)
+    return _generated.get(key, lambda: CodegenValidator(schema, memoize))
+
+
+def compile_validator(schema, memoize=False):
+    """Return the fastest shared validator available for ``schema``.
+
+    That is the generated-code validator, or the compiled jsonschema one for
+    schemas the generator does not handle. Both expose ``is_valid``,
+    ``validate`` and ``errors``.
+    """
+    try:
+        return compile_codegen(schema, memoize)
+    except ValueError:
+        return compile_schema(schema)
+
+
+def compile_memoized(schema):
+    """``compile_validator(schema, memoize=True)``, for callers taking a compile."""
+    return compile_validator(schema, memoize=True)
@@ -0,0 +1,334 @@
+from codegen_validator import compile_validator, json_equal
+from schema_flattener import flatten_schema
+from stages import stage_schema
+from validation_errors import Violation
+
+# Keywords whose verdict depends on the whole subtree below them: a change
+# anywhere under such a subschema re-validates it from there.
+_HOLISTIC = frozenset(["anyOf", "oneOf", "not", "enum", "const"])
+
+# Keywords that descend into children; dropped for "shallow" checks.
+_DESCENDING = frozenset(["properties", "items", "additionalProperties"])
+
+
+class PatchError(ValueError):
+    """The JSON Patch cannot be applied to the document."""
+
+
+def parse_pointer(pointer):
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError("invalid JSON pointer %r" % pointer)
+    return [
+        token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")
+    ]
+
+
+def _key(container, token, adding=False):
+    if isinstance(container, dict):
+        return token
+    if isinstance(container, list):
+        if adding and token == "-":
+            return len(container)
+        if not token.isdigit() or (token != "0" and token.startswith("0")):
+            raise PatchError("invalid array index %r" % token)
+        index = int(token)
+        if index > len(container) or (index == len(container) and not adding):
+            raise PatchError("array index %d out of range" % index)
+        return index
+    raise PatchError("cannot index into %r" % (container,))
+
+
+def _resolve(document, tokens):
+    """Convert pointer tokens into a path of real keys/indices."""
+    path = []
+    node = document
+    for token in tokens:
+        key = _key(node, token)
+        if isinstance(node, dict) and key not in node:
+            raise PatchError("no member %r" % key)
+        path.append(key)
+        node = node[key]
+    return tuple(path), node
+
+
+def _copy_on_write(node, tokens, change):
+    """Copy the containers along ``tokens`` and apply ``change`` at the end.
+
+    ``change(parent, token)`` mutates the (copied) parent of the target and
+    returns the real path key it used. Untouched subtrees stay shared.
+    """
+    node = dict(node) if isinstance(node, dict) else list(node)
+    if len(tokens) == 1:
+        return node, (change(node, tokens[0]),)
+    key = _key(node, tokens[0])
+    if isinstance(node, dict) and key not in node:
+        raise PatchError("no member %r" % key)
+    node[key], rest = _copy_on_write(node[key], tokens[1:], change)
+    return node, (key,) + rest
+
+
+def _add(value):
+    def change(parent, token):
+        key = _key(parent, token, adding=True)
+        if isinstance(parent, list):
+            parent.insert(key, value)
+        else:
+            parent[key] = value
+        return key
+
+    return change
+
+
+def _replace(value):
+    def change(parent, token):
+        key = _key(parent, token)
+        if isinstance(parent, dict) and key not in parent:
+            raise PatchError("no member %r to replace" % key)
+        parent[key] = value
+        return key
+
+    return change
+
+
+def _remove(parent, token):
+    key = _key(parent, token)
+    if isinstance(parent, dict) and key not in parent:
+        raise PatchError("no member %r to remove" % key)
+    del parent[key]
+    return key
+
+
+def _expand(schema, pointer, out):
+    """Add ``(schema, pointer)`` and those of its allOf parts to ``out``."""
+    out.append((schema, pointer))
+    if isinstance(schema, dict):
+        for index, sub in enumerate(schema.get("allOf", ())):
+            _expand(sub, "%s/allOf/%d" % (pointer, index), out)
+    return out
+
+
+class ValidationState:
+    """A document together with its violations, grouped by instance path."""
+
+    __slots__ = ("document", "by_path")
+
+    def __init__(self, document, by_path):
+        self.document = document
+        self.by_path = by_path
+
+    @property
+    def valid(self):
+        return not self.by_path
+
+    @property
+    def violations(self):
+        return [v for violations in self.by_path.values() for v in violations]
+
+
+class IncrementalValidator:
+    """Re-validates only the parts of a document a JSON Patch touched.
+
+    ``validate`` checks a whole document and returns its ValidationState;
+    ``revalidate`` takes that state and a JSON Patch (RFC 6902 operations)
+    and returns the state of the patched document. Replacing
+    ``/insurance_holder/phones/2/number`` re-checks that one value; adding
+    or removing an object member also re-checks the parent's own keywords
+    (``required``, ``additionalProperties``); inserting into or removing
+    from an array re-checks that array. Under ``anyOf``/``oneOf``/``not``/
+    ``enum``/``const``, which judge a whole subtree, re-validation starts at
+    that subschema. The previous document is never modified: the patched
+    one shares every untouched subtree with it.
+
+    States keep every violation, without a limit, so they can be updated.
+    """
+
+    def __init__(self, schema, stage=None):
+        if stage is not None:
+            schema = stage_schema(schema, stage)
+        # Raises ValueError for recursive schemas, whose subschemas cannot
+        # be validated on their own.
+        self.schema = flatten_schema(schema)
+        self._validators = {}
+        self._own = {}
+        self._shallow = {}
+
+    def _validator(self, schema):
+        entry = self._validators.get(id(schema))
+        if entry is None:
+            entry = self._validators[id(schema)] = (schema, compile_validator(schema))
+        return entry[1]
+
+    def _own_schema(self, schema):
+        # _schemas_at lists the allOf parts of a schema on their own;
+        # checking them with it too would report their violations twice.
+        own = self._own.get(id(schema))
+        if own is None:
+            own = {k: v for k, v in schema.items() if k != "allOf"}
+            self._own[id(schema)] = own
+        return own
+
+    def _shallow_schema(self, schema):
+        shallow = self._shallow.get(id(schema))
+        if shallow is None:
+            shallow = {k: v for k, v in schema.items() if k not in _DESCENDING}
+            if schema.get("additionalProperties") is False:
+                shallow["additionalProperties"] = False
+                shallow["properties"] = dict.fromkeys(
+                    schema.get("properties", ()), True
+                )
+            self._shallow[id(schema)] = shallow
+        return shallow
+
+    def _schemas_at(self, document, path):
+        """(subschema, pointer) pairs that apply at ``path``, allOf expanded."""
+        schemas = _expand(self.schema, "#", [])
+        node = document
+        for key in path:
+            children = []
+            for schema, pointer in schemas:
+                if not isinstance(schema, dict):
+                    continue
+                if isinstance(node, list):
+                    if "items" in schema:
+                        _expand(schema["items"], pointer + "/items", children)
+                elif key in schema.get("properties", {}):
+                    escaped = str(key).replace("~", "~0").replace("/", "~1")
+                    _expand(
+                        schema["properties"][key],
+                        "%s/properties/%s" % (pointer, escaped),
+                        children,
+                    )
+                elif schema.get("additionalProperties", False) is not False:
+                    # (False is reported at the parent, as a parent keyword.)
+                    _expand(
+                        schema["additionalProperties"],
+                        pointer + "/additionalProperties",
+                        children,
+                    )
+            schemas = children
+            node = node[key]
+        return schemas
+
+    def _holistic_root(self, document, path):
+        """The shortest prefix of ``path`` judged by a whole-subtree keyword."""
+        for depth in range(len(path) + 1):
+            for schema, _ in self._schemas_at(document, path[:depth]):
+                if isinstance(schema, dict) and _HOLISTIC.intersection(schema):
+                    return path[:depth]
+        return None
+
+    def _check(self, by_path, value, path, schemas, shallow=False):
+        for schema, pointer in schemas:
+            if schema is True:
+                continue
+            if schema is False:
+                violation = Violation(path, "false", pointer, value)
+                by_path.setdefault(path, []).append(violation)
+                continue
+            schema = self._own_schema(schema)
+            if shallow:
+                schema = self._shallow_schema(schema)
+            for error in self._validator(schema).errors(value):
+                full = path + error.path
+                by_path.setdefault(full, []).append(
+                    Violation(
+                        full,
+                        error.keyword,
+                        pointer + error.schema_path[1:],
+                        error.instance,
+                        error.expected,
+                    )
+                )
+
+    def _recheck_subtree(self, by_path, document, path):
+        for known in [p for p in by_path if p[: len(path)] == path]:
+            del by_path[known]
+        value = document
+        for key in path:
+            value = value[key]
+        self._check(by_path, value, path, self._schemas_at(document, path))
+
+    def _recheck_shallow(self, by_path, document, path):
+        # Only the errors reported at ``path`` itself come from its own
+        # keywords; errors further down are left alone.
+        by_path.pop(path, None)
+        value = document
+        for key in path:
+            value = value[key]
+        schemas = self._schemas_at(document, path)
+        self._check(by_path, value, path, schemas, shallow=True)
+
+    def validate(self, document):
+        by_path = {}
+        self._check(by_path, document, (), _expand(self.schema, "#", []))
+        return ValidationState(document, by_path)
+
+    def revalidate(self, state, patch):
+        """Apply the JSON Patch ``patch`` and return the new ValidationState."""
+        document = state.document
+        by_path = {path: list(v) for path, v in state.by_path.items()}
+        for operation in patch:
+            op = operation.get("op")
+            if op in ("move", "copy"):
+                _, value = _resolve(document, parse_pointer(operation["from"]))
+                if op == "move":
+                    document = self._apply(
+                        by_path, document, "remove", operation["from"]
+                    )
+                document = self._apply(
+                    by_path, document, "add", operation["path"], value
+                )
+            elif op == "test":
+                _, value = _resolve(document, parse_pointer(operation["path"]))
+                if not json_equal(value, operation["value"]):
+                    raise PatchError("test failed at %r" % operation["path"])
+            elif op in ("add", "remove", "replace"):
+                document = self._apply(
+                    by_path, document, op, operation["path"], operation.get("value")
+                )
+            else:
+                raise PatchError("unknown patch operation %r" % op)
+        return ValidationState(document, by_path)
+
+    def _apply(self, by_path, document, op, pointer, value=None):
+        tokens = parse_pointer(pointer)
+        if not tokens:
+            if op == "remove":
+                raise PatchError("cannot remove the whole document")
+            by_path.clear()
+            self._check(by_path, value, (), _expand(self.schema, "#", []))
+            return value
+
+        parent_path, parent = _resolve(document, tokens[:-1])
+        if op == "remove":
+            change = _remove
+        elif op == "add":
+            change = _add(value)
+        else:
+            change = _replace(value)
+        document, path = _copy_on_write(document, tokens, change)
+
+        if isinstance(parent, list) and op != "replace":
+            # Indices after the change shifted: re-check the whole array.
+            targets = [(parent_path, False)]
+        elif op == "replace":
+            targets = [(path, False)]
+        else:
+            targets = [(parent_path, True)]
+            if op == "add":
+                targets.append((path, False))
+            else:
+                for known in [p for p in by_path if p[: len(path)] == path]:
+                    del by_path[known]
+
+        for target, shallow in targets:
+            root = self._holistic_root(document, target)
+            if root is not None:
+                self._recheck_subtree(by_path, document, root)
+            elif shallow:
+                self._recheck_shallow(by_path, document, target)
+            else:
+                self._recheck_subtree(by_path, document, target)
+        return document
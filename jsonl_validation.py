@@ -0,0 +1,49 @@
+import json
+
+from stages import compile_stage
+
+
+def validate_jsonl(path, schema, stage, output):
+    """Validate each line of a JSONL file as a ``stage`` payload of ``schema``.
+
+    Records are read, validated and reported one at a time, so memory use
+    does not grow with the size of the file. For every non-blank line one
+    JSON result is written to the text stream ``output``::
+
+        {"line": 3, "valid": false}
+        {"line": 4, "valid": false, "error": "invalid JSON: ..."}
+
+    Returns the counts of records, valid records, invalid records and lines
+    that were not valid JSON.
+    """
+    is_valid = compile_stage(schema, stage).is_valid
+    counts = {"records": 0, "valid": 0, "invalid": 0, "malformed": 0}
+    write = output.write
+    with open(path, "rb") as lines:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            counts["records"] += 1
+            try:
+                record = json.loads(line)
+            except (ValueError, RecursionError) as e:
+                # RecursionError: nested deeper than json.loads can go.
+                counts["malformed"] += 1
+                write(
+                    json.dumps(
+                        {
+                            "line": number,
+                            "valid": False,
+                            "error": "invalid JSON: %s" % e,
+                        }
+                    )
+                    + "\n"
+                )
+                continue
+            if is_valid(record):
+                counts["valid"] += 1
+                write('{"line": %d, "valid": true}\n' % number)
+            else:
+                counts["invalid"] += 1
+                write('{"line": %d, "valid": false}\n' % number)
+    return counts
@@ -0,0 +1,333 @@
+import threading
+import weakref
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = ['%s="%s"' % (name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _ThreadToken:
+    """Lives in a metric's threading.local, so it goes when the thread does."""
+
+    __slots__ = ("__weakref__",)
+
+
+class _Metric:
+    """Base of Counter and Histogram: one shard of values per thread.
+
+    A thread only ever writes its own shard (a plain dict, found through a
+    threading.local), so updates take no lock; the lock is taken once per
+    thread, to register its shard, and by scrapes, which sum the shards.
+    When a thread ends, its shard is folded into one shard of retired
+    values, so short-lived threads do not leave one shard each behind.
+    """
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = {}
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            return self._new_shard()
+
+    def _new_shard(self):
+        shard = {}
+        token = self._local.token = _ThreadToken()
+        with self._lock:
+            self._shards[id(shard)] = shard
+        weakref.finalize(token, self._retire, shard).atexit = False
+        self._local.shard = shard
+        return shard
+
+    def _retire(self, shard):
+        with self._lock:
+            del self._shards[id(shard)]
+            for labels, value in shard.items():
+                self._fold(self._retired, labels, value)
+
+    def _fold(self, totals, labels, value):
+        """Add ``value`` to ``totals[labels]``."""
+        raise NotImplementedError
+
+    def _snapshot(self):
+        """Per-thread ``(labels, value)`` items, copied for the scrape."""
+        with self._lock:
+            shards = list(self._shards.values())
+            shards.append(self._retired)
+        # list() copies each dict without giving up the GIL, so a thread
+        # adding labels meanwhile cannot break the iteration.
+        return [item for shard in shards for item in list(shard.items())]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _fold(self, totals, labels, value):
+        totals[labels] = totals.get(labels, 0) + value
+
+    def values(self):
+        totals = {}
+        for labels, value in self._snapshot():
+            self._fold(totals, labels, value)
+        return totals
+
+    def expose(self):
+        return [
+            "%s%s %s" % (self.name, _labels(self.labelnames, labels), _number(value))
+            for labels, value in sorted(self.values().items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=None):
+        super().__init__(name, help, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        counts = shard.get(labels)
+        if counts is None:
+            # One count per bucket, one for +Inf, then the sum.
+            counts = shard[labels] = [0] * (len(self.bounds) + 1) + [0.0]
+        counts[bisect_left(self.bounds, value)] += 1
+        counts[-1] += value
+
+    def _fold(self, totals, labels, counts):
+        counts = list(counts)
+        total = totals.get(labels)
+        if total is None:
+            totals[labels] = counts
+        else:
+            for i, count in enumerate(counts):
+                total[i] += count
+
+    def values(self):
+        totals = {}
+        for labels, counts in self._snapshot():
+            self._fold(totals, labels, counts)
+        return totals
+
+    def expose(self):
+        lines = []
+        bounds = self.bounds + (float("inf"),)
+        for labels, counts in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(
+                    "%s_bucket%s %d"
+                    % (self.name, _labels(self.labelnames, labels, le), cumulative)
+                )
+            labelled = _labels(self.labelnames, labels)
+            lines.append("%s_sum%s %s" % (self.name, labelled, _number(counts[-1])))
+            lines.append("%s_count%s %d" % (self.name, labelled, cumulative))
+        return lines
+
+
+class Registry:
+    """A set of metrics, rendered together in the Prometheus text format.
+
+    ``collector(fn)`` adds values computed at scrape time: ``fn()`` returns
+    ``(name, kind, help, samples)`` tuples, ``samples`` being a list of
+    ``(labels dict, value)``.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=None):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def expose(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append("# HELP %s %s" % (metric.name, metric.help))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            lines.extend(metric.expose())
+        for collect in self._collectors:
+            for name, kind, help, samples in collect():
+                lines.append("# HELP %s %s" % (name, help))
+                lines.append("# TYPE %s %s" % (name, kind))
+                for labels, value in samples:
+                    lines.append(
+                        "%s%s %s"
+                        % (name, _labels(labels, labels.values()), _number(value))
+                    )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Metrics of the validation path. ``stage`` is "quote", "contract" or
+# "schema" for payloads validated against a whole schema.
+VALIDATIONS = REGISTRY.counter(
+    "payload_validations_total",
+    "Payloads validated, by stage and result (valid, invalid or malformed).",
+    ("stage", "result"),
+)
+FAILURES = REGISTRY.counter(
+    "payload_validation_failures_total",
+    "Violations reported, by stage and instance path (array indices as [*]).",
+    ("stage", "path"),
+)
+LATENCY = REGISTRY.histogram(
+    "payload_validation_seconds",
+    "Time spent validating one payload.",
+    ("stage",),
+    buckets=(1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 1e-2, 0.1, 1.0),
+)
+_LATENCY_BOUNDS = LATENCY.bounds
+PAYLOAD_BYTES = REGISTRY.histogram(
+    "payload_body_bytes",
+    "Size of the raw JSON bodies validated.",
+    ("stage",),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+
+
+# Per-thread shortcuts for observe_validation: by stage, this thread's
+# LATENCY bucket counts, its VALIDATIONS shard and the label tuples, so a
+# valid payload costs one lookup and three increments.
+_local = threading.local()
+
+
+def _stage_entry(stage):
+    try:
+        entries = _local.entries
+    except AttributeError:
+        entries = _local.entries = {}
+    name = stage or "schema"
+    labels = ((name,), (name, "valid"), (name, "invalid"), (name, "malformed"))
+    latency = LATENCY._shard()
+    counts = latency.get(labels[0])
+    if counts is None:
+        counts = latency[labels[0]] = [0] * (len(LATENCY.bounds) + 1) + [0.0]
+    validations = VALIDATIONS._shard()
+    for key in labels[1:]:
+        validations.setdefault(key, 0)
+    entry = entries[stage] = (counts, validations, labels)
+    return entry
+
+
+def observe_validation(stage, seconds, failures=(), size=None, malformed=False):
+    """Record one validation.
+
+    ``failures`` are the path patterns (validation_errors.path_pattern) of
+    its violations, ``size`` the length of the raw body if there was one.
+    """
+    try:
+        counts, validations, labels = _local.entries[stage]
+    except (AttributeError, KeyError):
+        counts, validations, labels = _stage_entry(stage)
+    counts[bisect_left(_LATENCY_BOUNDS, seconds)] += 1
+    counts[-1] += seconds
+    if malformed:
+        validations[labels[3]] += 1
+    elif failures:
+        validations[labels[2]] += 1
+        for path in failures:
+            FAILURES.inc((labels[0][0], path))
+    else:
+        validations[labels[1]] += 1
+    if size is not None:
+        PAYLOAD_BYTES.observe(size, labels[0])
+
+
+# Result caches handed to the validation entry points, for the hit rate.
+_caches = weakref.WeakSet()
+
+
+def watch_cache(cache):
+    _caches.add(cache)
+
+
+@REGISTRY.collector
+def _cache_samples():
+    caches = list(_caches)
+    hits = sum(cache.hits for cache in caches)
+    misses = sum(cache.misses for cache in caches)
+    return [
+        (
+            "payload_cache_requests_total",
+            "counter",
+            "Result cache lookups, by result (hit or miss).",
+            [({"result": "hit"}, hits), ({"result": "miss"}, misses)],
+        )
+    ]
+
+
+def start_http_server(port=9100, host="127.0.0.1", registry=REGISTRY):
+    """Serve ``GET /metrics`` from a daemon thread; returns the server."""
+    # Imported here: http.server is slow to import, and only processes that
+    # serve their own metrics need it.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.expose().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
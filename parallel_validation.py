@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from batch_validation import BatchResult, batch_validator
+
+# Set once per worker process by _init_worker; tasks only carry payloads.
+_is_valid = None
+
+
+def _init_worker(schema, stage):
+    global _is_valid
+    _is_valid = batch_validator(schema, stage).is_valid
+
+
+def _validate_chunk(chunk):
+    return bytes(map(_is_valid, chunk))
+
+
+def _chunks(instances, size):
+    iterator = iter(instances)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class ParallelValidator:
+    """A process pool whose workers each hold a validator for one schema.
+
+    The schema is sent to every worker once, when the pool starts, and each
+    worker builds its validator there; after that a task is just a chunk of
+    payloads and the bytes of their verdicts. Keep the pool around between
+    batches to avoid paying the process start-up again::
+
+        with ParallelValidator(schema, workers=32) as pool:
+            result = pool.validate(payloads)
+    """
+
+    def __init__(self, schema, workers=None, chunk_size=1000, stage=None):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(schema, stage),
+        )
+
+    def validate(self, instances):
+        """Validate ``instances`` and return a BatchResult in input order."""
+        valid = bytearray()
+        for flags in self._pool.map(
+            _validate_chunk, _chunks(instances, self.chunk_size)
+        ):
+            valid += flags
+        return BatchResult.from_flags(valid)
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def validate_parallel(instances, schema, workers=None, chunk_size=1000, stage=None):
+    """One-shot parallel counterpart of ``validate_batch``."""
+    with ParallelValidator(schema, workers, chunk_size, stage) as pool:
+        return pool.validate(instances)
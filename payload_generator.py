@@ -0,0 +1,429 @@
+import argparse
+import copy
+import json
+import random
+import sys
+from functools import reduce
+
+from codegen_validator import compile_validator, resolve_pointer
+from schema_flattener import flatten_schema, merge_schemas
+from stages import STAGES, stage_schema
+
+_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam "
+    "quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo"
+).split()
+
+_STATES = (
+    "AC AL AP AM BA CE DF ES GO MA MT MS MG PA PB PR PE PI RJ RN RS RO RR SC SP SE TO"
+).split()
+
+_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+# random.Random's choice/randint/randrange cost several Python calls each;
+# these helpers make a single random() call, which adds up over millions of
+# generated values.
+def _int(rng, low, high):
+    return low + int(rng.random() * (high - low + 1))
+
+
+def _pick(rng, choices):
+    return choices[int(rng.random() * len(choices))]
+
+
+def _digits(rng, count):
+    return "%0*d" % (count, int(rng.random() * 10**count))
+
+
+def _date(rng):
+    return "%04d-%02d-%02d" % (
+        _int(rng, 1940, 2024),
+        _int(rng, 1, 12),
+        _int(rng, 1, 28),
+    )
+
+
+def _lorem(rng):
+    return " ".join([_pick(rng, _WORDS) for _ in range(_int(rng, 1, 4))])
+
+
+# Plausible strings for well-known property names; anything else is lorem.
+_STRING_HINTS = {
+    "cpf": lambda rng: "%s.%s.%s-%s"
+    % (_digits(rng, 3), _digits(rng, 3), _digits(rng, 3), _digits(rng, 2)),
+    "email": lambda rng: "%s.%s@example.com" % (_pick(rng, _WORDS), _digits(rng, 4)),
+    "birth_date": _date,
+    "issue_date": _date,
+    "zipcode": lambda rng: "%s-%s" % (_digits(rng, 5), _digits(rng, 3)),
+    "area_code": lambda rng: _digits(rng, 2),
+    "state": lambda rng: _pick(rng, _STATES),
+    "country": lambda rng: "BR",
+    "license_plate": lambda rng: "%s%s%s%s"
+    % (
+        _pick(rng, _LETTERS),
+        _pick(rng, _LETTERS),
+        _pick(rng, _LETTERS),
+        _digits(rng, 4),
+    ),
+    "renavam": lambda rng: _digits(rng, 11),
+    "manufacture_year": lambda rng: "%d" % _int(rng, 1990, 2024),
+    "model_year": lambda rng: "%d" % _int(rng, 1990, 2025),
+    "fipe_code": lambda rng: "%s-%s" % (_digits(rng, 6), _digits(rng, 1)),
+}
+
+_INTEGER_HINTS = {
+    "age": lambda rng: _int(rng, 0, 99),
+}
+
+# Replacement values for a type violation, with the JSON types they have.
+_WRONG_VALUES = (
+    (("string",), "not-a-%s"),
+    (("integer", "number"), 0),
+    (("boolean",), True),
+    (("array",), []),
+    (("object",), {}),
+    (("null",), None),
+)
+
+
+def _types(schema):
+    types = schema.get("type")
+    if types is None:
+        return ()
+    return (types,) if isinstance(types, str) else tuple(types)
+
+
+class PayloadGenerator:
+    """Seedable generator of synthetic payloads for a schema.
+
+    Walks the flattened schema of a stage (``stage="contract"``), of one
+    definition (``definition="risk_car"``) or of the whole ``schema``, and
+    builds a small closure per subschema once, so generating a record is a
+    chain of plain calls. Arrays get ``items=(min, max)`` entries, or the
+    exact count or range given for their property name in ``array_sizes``
+    (e.g. ``{"phones": 10000}``); optional properties are included with
+    probability ``optional``. Below ``max_depth`` containers, arrays are
+    left empty and optional properties out (a schema whose *required*
+    properties recurse forever cannot be generated). Well-known fields
+    (cpf, email, dates, zipcode, ...) get plausible values, other strings
+    lorem words.
+
+    ``invalid()`` returns a payload with one deliberate violation: a
+    missing required property, a value of the wrong type, a value outside
+    its enum or an unexpected property.
+    """
+
+    def __init__(
+        self,
+        schema,
+        stage=None,
+        definition=None,
+        seed=None,
+        items=(1, 3),
+        array_sizes=None,
+        optional=0.5,
+        max_depth=8,
+    ):
+        if stage is not None:
+            schema = stage_schema(schema, stage)
+        try:
+            flattened = flatten_schema(schema)
+        except ValueError:
+            # Recursive schemas keep their $refs; max_depth ends the recursion.
+            flattened = schema
+        self.root = flattened
+        self.schema = flattened
+        if definition is not None:
+            self.schema = flattened["definitions"][definition]
+        self.random = random.Random(seed)
+        self.items = items
+        self.array_sizes = array_sizes or {}
+        self.optional = optional
+        self.max_depth = max_depth
+        self._compiled = {}
+        self._generate = self._compile(self.schema, None)
+        self._validator = None
+
+    def _resolve(self, schema):
+        """Fold $ref, allOf and a chosen anyOf/oneOf branch into one schema."""
+        if not isinstance(schema, dict):
+            return schema
+        if "$ref" in schema:
+            siblings = {k: v for k, v in schema.items() if k != "$ref"}
+            target = self._resolve(resolve_pointer(self.root, schema["$ref"]))
+            schema = merge_schemas(target, siblings) if siblings else target
+        if "allOf" in schema:
+            rest = {k: v for k, v in schema.items() if k != "allOf"}
+            parts = [self._resolve(sub) for sub in schema["allOf"]]
+            schema = reduce(merge_schemas, parts, rest)
+            if isinstance(schema, dict) and "allOf" in schema:
+                # Kept apart by merge_schemas (additionalProperties); use the
+                # parts' properties together, which satisfies both.
+                merged = {k: v for k, v in schema.items() if k != "allOf"}
+                for part in schema["allOf"]:
+                    for key, value in part.items():
+                        merged.setdefault(key, value)
+                schema = merged
+        return schema
+
+    def _compile(self, schema, name):
+        # Keyed by id(); the entry keeps the schema alive so its id stays
+        # unique even for the merged schemas built along the way.
+        key = (id(schema), name)
+        entry = self._compiled.get(key)
+        if entry is not None:
+            return entry[1]
+        # Registered before compiling children, so recursive schemas call
+        # back into the function instead of compiling forever.
+        self._compiled[key] = (schema, lambda depth: generate(depth))
+        generate = self._build(schema, name)
+        self._compiled[key] = (schema, generate)
+        return generate
+
+    def _build(self, schema, name):
+        rng = self.random
+        if schema is True:
+            return lambda depth: _lorem(rng)
+        if schema is False:
+            raise ValueError("no value satisfies the false schema at %r" % name)
+        schema = self._resolve(schema)
+
+        if "const" in schema:
+            value = schema["const"]
+            return lambda depth: copy.deepcopy(value)
+        if "enum" in schema:
+            choices = schema["enum"]
+            return lambda depth: copy.deepcopy(_pick(rng, choices))
+        for keyword in ("anyOf", "oneOf"):
+            if keyword in schema:
+                rest = {k: v for k, v in schema.items() if k != keyword}
+                branches = [
+                    self._compile(merge_schemas(rest, self._resolve(branch)), name)
+                    for branch in schema[keyword]
+                ]
+                if keyword == "oneOf":
+                    # The first branch is the only one sure not to overlap
+                    # with an earlier one.
+                    return branches[0]
+                return lambda depth: _pick(rng, branches)(depth)
+
+        types = _types(schema)
+        if not types:
+            if "properties" in schema or "required" in schema:
+                types = ("object",)
+            elif "items" in schema:
+                types = ("array",)
+            else:
+                types = ("string",)
+        kind = next((t for t in types if t != "null"), "null")
+        if kind == "object":
+            return self._build_object(schema)
+        if kind == "array":
+            return self._build_array(schema, name)
+        if kind == "string":
+            hint = _STRING_HINTS.get(name)
+            if hint is not None:
+                return lambda depth: hint(rng)
+            return lambda depth: _lorem(rng)
+        if kind == "integer":
+            hint = _INTEGER_HINTS.get(name)
+            if hint is not None:
+                return lambda depth: hint(rng)
+            return lambda depth: _int(rng, 0, 9999)
+        if kind == "number":
+            return lambda depth: round(rng.uniform(0, 10000), 2)
+        if kind == "boolean":
+            return lambda depth: rng.random() < 0.5
+        return lambda depth: None
+
+    def _build_object(self, schema):
+        rng = self.random
+        optional = self.optional
+        max_depth = self.max_depth
+        required = set(schema.get("required", ()))
+        properties = schema.get("properties", {})
+        fields = [
+            (name, name in required, self._compile(sub, name))
+            for name, sub in properties.items()
+        ]
+        for name in required.difference(properties):
+            additional = schema.get("additionalProperties", True)
+            fields.append((name, True, self._compile(additional, name)))
+
+        def generate(depth):
+            depth += 1
+            return {
+                name: field(depth)
+                for name, needed, field in fields
+                if needed or (depth <= max_depth and rng.random() < optional)
+            }
+
+        return generate
+
+    def _build_array(self, schema, name):
+        rng = self.random
+        max_depth = self.max_depth
+        size = self.array_sizes.get(name, self.items)
+        low, high = (size, size) if isinstance(size, int) else size
+        item = self._compile(schema.get("items", True), None)
+
+        def generate(depth):
+            if depth >= max_depth:
+                return []
+            depth += 1
+            return [item(depth) for _ in range(_int(rng, low, high))]
+
+        return generate
+
+    def valid(self):
+        """One payload that satisfies the schema."""
+        return self._generate(0)
+
+    def _sites(self, schema, value, container, key, out):
+        """Collect the places in ``value`` where a violation can be planted."""
+        if not isinstance(schema, dict):
+            return out
+        schema = self._resolve(schema)
+        if "anyOf" in schema or "oneOf" in schema or "not" in schema:
+            return out  # no mutation is certain to fail these
+        if container is not None:
+            if "enum" in schema:
+                out.append(("enum", container, key, schema["enum"]))
+            elif _types(schema):
+                out.append(("type", container, key, _types(schema)))
+        if isinstance(value, dict):
+            for name in schema.get("required", ()):
+                if name in value:
+                    out.append(("required", value, name, None))
+            if schema.get("additionalProperties") is False:
+                out.append(("additional", value, None, None))
+            properties = schema.get("properties", {})
+            for name, item in value.items():
+                if name in properties:
+                    self._sites(properties[name], item, value, name, out)
+        elif isinstance(value, list) and "items" in schema:
+            for index, item in enumerate(value):
+                self._sites(schema["items"], item, value, index, out)
+        return out
+
+    def _plant(self, document):
+        """Plant one violation in ``document``; False if none sticks."""
+        rng = self.random
+        sites = self._sites(self.schema, document, None, None, [])
+        rng.shuffle(sites)
+        for kind, container, key, detail in sites:
+            if kind == "additional":
+                name = "unexpected_%d" % rng.randrange(1000)
+                while name in container:
+                    name += "_"
+                undo = lambda: container.pop(name)
+                container[name] = "x"
+            else:
+                previous = container[key]
+                undo = lambda: container.__setitem__(key, previous)
+                if kind == "required":
+                    del container[key]
+                elif kind == "enum":
+                    container[key] = "not-one-of-%d" % len(detail)
+                else:
+                    wrong = next(
+                        v for types, v in _WRONG_VALUES if not set(types) & set(detail)
+                    )
+                    container[key] = wrong % detail[0] if wrong == "not-a-%s" else wrong
+            if not self._validator.is_valid(document):
+                return True
+            undo()
+        return False
+
+    def invalid(self, attempts=100):
+        """One payload with a deliberate violation.
+
+        Payloads whose optional parts happen to leave nothing to violate
+        are regenerated, up to ``attempts`` times; then ValueError.
+        """
+        if self._validator is None:
+            self._validator = compile_validator(self.schema)
+        for _ in range(attempts):
+            document = self.valid()
+            if self._plant(document):
+                return document
+        raise ValueError("the schema leaves nothing to violate in its payloads")
+
+    def generate(self, count, invalid_rate=0.0):
+        """Yield ``count`` ``(payload, is_valid)`` pairs."""
+        rng = self.random
+        for _ in range(count):
+            if invalid_rate and rng.random() < invalid_rate:
+                yield self.invalid(), False
+            else:
+                yield self.valid(), True
+
+    def write_jsonl(self, output, count, invalid_rate=0.0, batch=1000):
+        """Write ``count`` payloads to ``output``, one compact JSON per line.
+
+        Returns ``{"records": ..., "valid": ..., "invalid": ...}``.
+        """
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+        counts = {"records": 0, "valid": 0, "invalid": 0}
+        lines = []
+        for payload, is_valid in self.generate(count, invalid_rate):
+            lines.append(dumps(payload) + "\n")
+            counts["valid" if is_valid else "invalid"] += 1
+            if len(lines) >= batch:
+                output.writelines(lines)
+                lines = []
+        output.writelines(lines)
+        counts["records"] = count
+        return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic payloads as JSONL.")
+    parser.add_argument("--stage", choices=STAGES)
+    parser.add_argument("--definition", help="generate one definition, e.g. pet")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--invalid-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--items", type=int, nargs=2, default=(1, 3), metavar=("MIN", "MAX")
+    )
+    parser.add_argument(
+        "--array-size",
+        action="append",
+        default=[],
+        metavar="NAME=COUNT",
+        help="exact length of the arrays named NAME, e.g. phones=10000",
+    )
+    parser.add_argument("--optional", type=float, default=0.5)
+    parser.add_argument("--max-depth", type=int, default=8)
+    parser.add_argument("--output", "-o", default="-")
+    args = parser.parse_args(argv)
+
+    from testJsonschema import json_str
+
+    array_sizes = {}
+    for option in args.array_size:
+        name, _, count = option.partition("=")
+        array_sizes[name] = int(count)
+    generator = PayloadGenerator(
+        json_str,
+        stage=args.stage,
+        definition=args.definition,
+        seed=args.seed,
+        items=tuple(args.items),
+        array_sizes=array_sizes,
+        optional=args.optional,
+        max_depth=args.max_depth,
+    )
+    if args.output == "-":
+        counts = generator.write_jsonl(sys.stdout, args.count, args.invalid_rate)
+    else:
+        with open(args.output, "w", encoding="utf-8") as output:
+            counts = generator.write_jsonl(output, args.count, args.invalid_rate)
+    print(json.dumps(counts), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+from collections import deque
+
+from jsonschema import ValidationError
+
+from validation_errors import ErrorReport, localize
+
+
+def _pointer_tokens(pointer):
+    tokens = deque()
+    for token in pointer.split("/")[1:]:
+        token = token.replace("~1", "/").replace("~0", "~")
+        tokens.append(int(token) if token.isdigit() else token)
+    return tokens
+
+
+class PayloadInvalid(ValidationError):
+    """A ``jsonschema.ValidationError`` for one violation of an ErrorReport.
+
+    jsonschema's errors are filled in eagerly (message, schema, context
+    lists); this one keeps the report and derives ``message``, ``path``,
+    ``schema_path``, ``validator`` and the rest only when they are read.
+    ``except jsonschema.ValidationError`` still catches it.
+    """
+
+    def __init__(self, report, index=0):
+        Exception.__init__(self)
+        self.report = report
+        self.index = index
+        self.context = []
+        self.cause = None
+        self.parent = None
+        self.schema = None
+        self._path = self._schema_path = None
+
+    @property
+    def message(self):
+        return self.report[self.index].message
+
+    @property
+    def path(self):
+        # Created once, so callers may extend it, as with jsonschema's.
+        if self._path is None:
+            self._path = deque(self.report.paths[self.index])
+        return self._path
+
+    relative_path = path
+
+    @property
+    def schema_path(self):
+        if self._schema_path is None:
+            self._schema_path = _pointer_tokens(self.report.schema_path(self.index))
+        return self._schema_path
+
+    relative_schema_path = schema_path
+
+    @property
+    def validator(self):
+        return self.report.keyword(self.index)
+
+    @property
+    def validator_value(self):
+        return self.report.expected[self.index]
+
+    @property
+    def instance(self):
+        return self.report.instances[self.index]
+
+    def __reduce__(self):
+        # Only this violation travels, with its ids turned back into names
+        # (see ErrorReport.__reduce__); paths extended by callers are kept.
+        report = ErrorReport(self.report.titles)
+        violation = self.report[self.index]
+        report.add(
+            violation.path,
+            violation.keyword,
+            violation.schema_path,
+            violation.instance,
+            violation.expected,
+        )
+        state = {k: v for k, v in self.__dict__.items() if k not in ("report", "index")}
+        return PayloadInvalid, (report,), state
+
+    def localized(self, locale="pt-br"):
+        return localize(self.report[self.index], locale)
+
+    def __str__(self):
+        return self.message
@@ -0,0 +1,150 @@
+import time
+
+from jsonschema.validators import Draft202012Validator, validator_for
+
+from codegen_validator import _Generator, compile_validator
+from schema_validator import SharedCache, schema_hash
+
+
+class _ProfilingGenerator(_Generator):
+    """Generator whose keyword checks record their call count and time.
+
+    Every instrumented site gets an index into the ``_N`` (calls), ``_T``
+    (seconds) and ``_S`` (self seconds) lists of the generated module.
+    ``_T`` is inclusive: the time of ``properties``, ``items``, ``allOf`` or
+    a ``$ref`` contains that of the checks below it. ``_S`` leaves that
+    out; ``_D[0]`` is the time of every site finished so far, from which a
+    site tells how much of its own time went to the sites nested in it.
+    """
+
+    def __init__(self, schema):
+        super().__init__(schema)
+        self.sites = []
+
+    def keyword(self, keyword, pointer, lines):
+        if not lines:
+            return lines
+        index = len(self.sites)
+        self.sites.append((keyword, pointer))
+        start, done, elapsed = "_t%d" % index, "_d%d" % index, "_e%d" % index
+        return (
+            ["%s = _D[0]" % done, "%s = _clock()" % start, "try:"]
+            + ["    " + line for line in lines]
+            + [
+                "finally:",
+                "    %s = _clock() - %s" % (elapsed, start),
+                "    _N[%d] += 1" % index,
+                "    _T[%d] += %s" % (index, elapsed),
+                "    _S[%d] += %s - (_D[0] - %s)" % (index, elapsed, done),
+                "    _D[0] = %s + %s" % (done, elapsed),
+            ]
+        )
+
+
+class ProfiledValidator:
+    """Boolean validator that profiles where its time goes.
+
+    The code is generated from the schema as written, with ``$ref`` kept as
+    calls, so time and calls can be attributed per reference target
+    (``#/definitions/address``) and per keyword (``type``, ``required``,
+    ``properties``, ``items``, ...). The instrumentation makes it several
+    times slower than the regular validator, which it does not touch: with
+    profiling off, nothing of this runs. Counts are not synchronized, so
+    they are approximate when several threads validate at once.
+    """
+
+    def __init__(self, schema):
+        if validator_for(schema) is not Draft202012Validator:
+            raise ValueError("profiling only supports draft 2020-12 schemas")
+        validator_for(schema).check_schema(schema)
+        self.schema = schema
+        self.hash = schema_hash(schema)
+        generator = _ProfilingGenerator(schema)
+        self.source = generator.generate()
+        self.sites = generator.sites
+        self._calls = [0] * len(self.sites)
+        self._seconds = [0.0] * len(self.sites)
+        self._self_seconds = [0.0] * len(self.sites)
+        namespace = {
+            "__name__": "profile_%s" % self.hash[:12],
+            "_clock": time.perf_counter,
+            "_N": self._calls,
+            "_T": self._seconds,
+            "_S": self._self_seconds,
+            "_D": [0.0],
+        }
+        exec(compile(self.source, "<profile %s>" % self.hash[:12], "exec"), namespace)
+        self.is_valid = namespace["validate"]
+
+    def validate(self, instance):
+        if not self.is_valid(instance):
+            compile_validator(self.schema).validate(instance)
+
+    def errors(self, instance, limit=None):
+        # Error reports are not profiled; only the is_valid pass is.
+        if self.is_valid(instance):
+            return []
+        return compile_validator(self.schema).errors(instance, limit)
+
+    def reset(self):
+        self._calls[:] = [0] * len(self.sites)
+        self._seconds[:] = [0.0] * len(self.sites)
+        self._self_seconds[:] = [0.0] * len(self.sites)
+
+    def stats(self):
+        """``{(kind, name): [calls, seconds, self seconds]}``.
+
+        ``kind`` is ``"$ref"`` with the target pointer as name, or
+        ``"keyword"`` with the keyword as name.
+        """
+        totals = {}
+        for (keyword, pointer), *counts in zip(
+            self.sites, self._calls, self._seconds, self._self_seconds
+        ):
+            key = ("$ref", pointer) if keyword == "$ref" else ("keyword", keyword)
+            entry = totals.setdefault(key, [0, 0.0, 0.0])
+            for i, count in enumerate(counts):
+                entry[i] += count
+        return totals
+
+
+_profiled = SharedCache()
+
+
+def compile_profiled(schema):
+    """Return the shared ProfiledValidator for ``schema``, building it once."""
+    return _profiled.get(schema_hash(schema), lambda: ProfiledValidator(schema))
+
+
+def profile():
+    """Rows ``(kind, name, calls, seconds, self seconds)``, most expensive first.
+
+    Sums the counts of every profiled validator since the last reset().
+    """
+    totals = {}
+    for validator in list(_profiled.values()):
+        for key, counts in validator.stats().items():
+            entry = totals.setdefault(key, [0, 0.0, 0.0])
+            for i, count in enumerate(counts):
+                entry[i] += count
+    rows = [key + tuple(counts) for key, counts in totals.items() if counts[0]]
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows
+
+
+def reset():
+    for validator in list(_profiled.values()):
+        validator.reset()
+
+
+def format_profile(rows, limit=None):
+    """Render profile() rows as a table."""
+    template = "%-8s %-36s %10s %12s %12s %10s"
+    lines = [template % ("kind", "name", "calls", "total ms", "self ms", "mean us")]
+    for kind, name, calls, seconds, self_seconds in rows[:limit]:
+        mean = seconds / calls * 1e6 if calls else 0.0
+        lines.append(
+            "%-8s %-36s %10d %12.3f %12.3f %10.3f"
+            % (kind, name, calls, seconds * 1e3, self_seconds * 1e3, mean)
+        )
+    return "\n".join(lines)
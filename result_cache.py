@@ -0,0 +1,149 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from validation_errors import Violation
+
+_MISSING = object()
+
+
+def _key(data, version, person):
+    digest = hashlib.blake2b(data, digest_size=16, person=person)
+    digest.update(version.encode("ascii"))
+    return digest.digest()
+
+
+def payload_key(instance, version):
+    """Content hash of a parsed payload under a schema version.
+
+    The payload is canonicalized first (sorted keys, compact separators),
+    so key order does not matter. A ``str`` is a JSON string payload here,
+    not a body: see body_key.
+    """
+    data = json.dumps(
+        instance, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+    return _key(data, version, b"payload")
+
+
+def body_key(body, version):
+    """Content hash of a raw JSON body (bytes, memoryview or str).
+
+    Hashed as it is, which is cheaper than payload_key but only matches
+    byte-identical retries; never equal to the key of a parsed payload.
+    """
+    data = body.encode("utf-8") if isinstance(body, str) else bytes(body)
+    return _key(data, version, b"body")
+
+
+class ResultCache:
+    """Thread-safe LRU of validation results with a time-to-live.
+
+    Holds at most ``maxsize`` results; each expires ``ttl`` seconds after
+    it was stored (``ttl=None`` keeps results until they are evicted).
+    """
+
+    def __init__(self, maxsize=10000, ttl=300.0, clock=time.monotonic):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        expires = None if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class CachedValidator:
+    """Puts a ResultCache in front of a compiled validator.
+
+    A payload seen before (same content, same schema version) gets its
+    stored verdict without being walked again. Only verdicts and error
+    lists are cached; ``validate`` still re-runs the validator on a cached
+    failure to raise a fresh exception.
+
+    Error lists are stored as plain rows, without the failing values, so
+    the cache keeps no part of a payload alive; a cached list comes back
+    as new Violations with ``instance`` None and the message already
+    rendered.
+
+    Canonicalizing a parsed payload costs about as much as running the
+    generated validator on it, so for parsed payloads the cache pays off
+    in front of the jsonschema fallback or error collection. Raw bodies
+    (see ``validation.validate_bytes``) are cheap to key and always gain.
+    """
+
+    def __init__(self, validator, cache, version=None):
+        self.validator = validator
+        self.cache = cache
+        self.version = version or validator.hash
+
+    def is_valid(self, instance):
+        key = payload_key(instance, self.version)
+        verdict = self.cache.get(key, _MISSING)
+        if verdict is _MISSING:
+            verdict = self.validator.is_valid(instance)
+            self.cache.put(key, verdict)
+        return verdict
+
+    def validate(self, instance):
+        if not self.is_valid(instance):
+            self.validator.validate(instance)
+
+    def errors(self, instance, limit=None):
+        key = payload_key(instance, "%s/errors/%s" % (self.version, limit))
+        rows = self.cache.get(key, _MISSING)
+        if rows is _MISSING:
+            errors = self.validator.errors(instance, limit)
+            rows = tuple(
+                (v.path, v.keyword, v.schema_path, v.expected, v.message)
+                for v in errors
+            )
+            self.cache.put(key, rows)
+            return errors
+        titles = getattr(self.validator, "titles", None)
+        return [
+            Violation(path, keyword, schema_path, None, expected, message, titles)
+            for path, keyword, schema_path, expected, message in rows
+        ]
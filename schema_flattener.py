@@ -0,0 +1,167 @@
+from urllib.parse import urldefrag, urljoin
+
+import jsonref
+
+from schema_validator import SharedCache, schema_hash
+
+# Keywords whose values are instance data, not subschemas: never look for
+# references inside them.
+_DATA_KEYWORDS = frozenset(["enum", "const", "default", "examples"])
+
+# Keywords whose values map names to subschemas: their keys are property or
+# definition names, never keywords.
+_NAMED_SUBSCHEMAS = frozenset(
+    ["properties", "patternProperties", "definitions", "$defs", "dependentSchemas"]
+)
+
+# Annotations only; when a $ref and its siblings both carry one, the sibling
+# (the more specific, local label) wins.
+_ANNOTATIONS = frozenset(["titles", "title", "description", "$comment"])
+
+_TYPE_ORDER = ["null", "boolean", "object", "array", "number", "integer", "string"]
+
+
+def _types(value):
+    return {value} if isinstance(value, str) else set(value)
+
+
+def _intersect_types(one, two):
+    one, two = _types(one), _types(two)
+    common = one & two
+    # "integer" is a subset of "number".
+    if "number" in one and "integer" in two or "integer" in one and "number" in two:
+        common.add("integer")
+    if not common:
+        return None
+    common = [t for t in _TYPE_ORDER if t in common]
+    return common[0] if len(common) == 1 else common
+
+
+def merge_schemas(one, two):
+    """Merge two $ref-free schemas into one that accepts what both accept."""
+    if one is True or two is False:
+        return two
+    if two is True or one is False:
+        return one
+    if ("additionalProperties" in one or "additionalProperties" in two) and (
+        "properties" in one or "properties" in two
+    ):
+        # additionalProperties depends on the sibling properties; keep the
+        # two schemas apart rather than change what either of them means.
+        return {"allOf": [one, two]}
+
+    merged = dict(one)
+    extra = []
+    for key, value in two.items():
+        if key not in merged or key in _ANNOTATIONS:
+            merged[key] = value
+        elif key == "properties":
+            properties = dict(merged[key])
+            for name, sub in value.items():
+                if name in properties:
+                    properties[name] = merge_schemas(properties[name], sub)
+                else:
+                    properties[name] = sub
+            merged[key] = properties
+        elif key == "required":
+            merged[key] = list(dict.fromkeys(merged[key] + value))
+        elif key == "items":
+            merged[key] = merge_schemas(merged[key], value)
+        elif key == "allOf":
+            merged[key] = merged[key] + value
+        elif key == "type" and _intersect_types(merged[key], value) is not None:
+            merged[key] = _intersect_types(merged[key], value)
+        elif merged[key] != value:
+            extra.append({key: value})
+    if extra:
+        merged["allOf"] = merged.get("allOf", []) + extra
+    return merged
+
+
+class _Flattener:
+    def __init__(self):
+        self.resolved = {}
+        self.stack = []
+
+    def flatten(self, node, names=False):
+        """Flatten ``node``; ``names`` if it maps names to subschemas."""
+        if isinstance(node, jsonref.JsonRef):
+            return self.flatten_ref(node)
+        if isinstance(node, dict):
+            if names:
+                return {key: self.flatten(value) for key, value in node.items()}
+            return {
+                key: (
+                    value
+                    if key in _DATA_KEYWORDS
+                    else self.flatten(value, key in _NAMED_SUBSCHEMAS)
+                )
+                for key, value in node.items()
+            }
+        if isinstance(node, list):
+            return [self.flatten(value) for value in node]
+        return node
+
+    def raw_target(self, node, uri):
+        """The node ``uri`` points to, before jsonref follows it any further.
+
+        ``node.__subject__`` has already gone through a target that is itself
+        a $ref, dropping the keywords next to that inner $ref; the raw node
+        keeps them, and flattening it merges them in.
+        """
+        document, fragment = urldefrag(uri)
+        store = object.__getattribute__(node, "store")
+        if document not in store:
+            return node.__subject__
+        return jsonref.JsonRef.resolve_pointer(node, store[document], fragment)
+
+    def flatten_ref(self, node):
+        # full_uri is not reachable through the proxy; rebuild it.
+        uri = urljoin(
+            object.__getattribute__(node, "base_uri"), node.__reference__["$ref"]
+        )
+        if uri in self.stack:
+            raise ValueError(
+                "recursive reference cannot be flattened: %s"
+                % " -> ".join(self.stack + [uri])
+            )
+        target = self.resolved.get(uri)
+        if target is None:
+            self.stack.append(uri)
+            try:
+                target = self.resolved[uri] = self.flatten(self.raw_target(node, uri))
+            finally:
+                self.stack.pop()
+        siblings = {k: v for k, v in node.__reference__.items() if k != "$ref"}
+        if not siblings:
+            return target
+        return merge_schemas(target, self.flatten(siblings))
+
+
+def flatten(schema):
+    """Resolve every local $ref in ``schema`` and merge it with its siblings.
+
+    Chains such as ``risk_person -> person -> address`` are inlined, and a
+    reference with sibling keywords (``insurance_holder`` is ``$ref: person``
+    plus its own ``properties``) becomes a single merged subschema. The
+    result has no ``$ref`` left. Raises ValueError for recursive schemas,
+    which cannot be expanded, and for references that do not resolve.
+    """
+    try:
+        document = jsonref.replace_refs(
+            schema, jsonschema=True, lazy_load=False, load_on_repr=False
+        )
+    except jsonref.JsonRefError as e:
+        raise ValueError("cannot resolve references: %s" % e) from e
+    return _Flattener().flatten(document)
+
+
+_flattened = SharedCache()
+
+
+def flatten_schema(schema):
+    """Return the shared flattened form of ``schema``, built once per hash.
+
+    The returned dict is shared between callers and must not be mutated.
+    """
+    return _flattened.get(schema_hash(schema), lambda: flatten(schema))
@@ -0,0 +1,244 @@
+"""Versioned schemas loaded from files, with hot reload.
+
+Schemas live under ``schemas/<name>/<version>.json`` (the insurance
+schema is ``schemas/insurance/1.json``); a new version is deployed by
+adding a file, the highest version being the current one.
+"""
+
+import json
+import os
+import threading
+
+from codegen_validator import compile_validator
+from schema_validator import schema_hash
+from stages import STAGES, compile_stage
+
+SCHEMA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schemas")
+
+_SUFFIX = ".json"
+
+
+def _version_key(version):
+    # "10" sorts after "9", "1.10" after "1.9".
+    return tuple(
+        (0, int(part), "") if part.isdigit() else (1, 0, part)
+        for part in version.split(".")
+    )
+
+
+def schema_versions(name, root=SCHEMA_ROOT):
+    """Versions of schema ``name`` found under ``root``, oldest first."""
+    try:
+        files = os.listdir(os.path.join(root, name))
+    except FileNotFoundError:
+        return []
+    versions = [f[: -len(_SUFFIX)] for f in files if f.endswith(_SUFFIX)]
+    return sorted(versions, key=_version_key)
+
+
+def schema_file(name, version=None, root=SCHEMA_ROOT):
+    """Path of a version of schema ``name``; the latest if ``version`` is None."""
+    if version is None:
+        versions = schema_versions(name, root)
+        if not versions:
+            raise LookupError("no versions of schema %r in %s" % (name, root))
+        version = versions[-1]
+    return os.path.join(root, name, "%s%s" % (version, _SUFFIX))
+
+
+def load_schema(name, version=None, root=SCHEMA_ROOT):
+    """Read a version of schema ``name``; the latest if ``version`` is None."""
+    with open(schema_file(name, version, root), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class SchemaVersion:
+    """One version of a schema with all its validators built.
+
+    Immutable once built: a caller holding it (or one of its validators)
+    keeps validating against that version, whatever the registry swaps in
+    meanwhile.
+    """
+
+    def __init__(self, name, version, schema, fingerprint, stages=STAGES):
+        self.name = name
+        self.version = version
+        self.schema = schema
+        self.hash = schema_hash(schema)
+        self.fingerprint = fingerprint
+        self.validators = {None: compile_validator(schema)}
+        for stage in stages:
+            self.validators[stage] = compile_stage(schema, stage)
+
+    def validator(self, stage=None):
+        try:
+            return self.validators[stage]
+        except KeyError:
+            raise ValueError("unknown stage %r" % (stage,)) from None
+
+    def __repr__(self):
+        return "<SchemaVersion %s %s>" % (self.name, self.version)
+
+
+class SchemaRegistry:
+    """Current compiled version of every schema, rebuilt off the request path.
+
+    ``validator(name, stage)`` returns the validator of the current version
+    of ``name``. ``refresh()`` (or the ``watch()`` thread) looks for new or
+    changed schema files and builds them on a single background thread,
+    then swaps the new version in with one assignment: calls already
+    running finish on the version they started with, and no caller ever
+    waits for, or repeats, a rebuild. Only the very first use of a schema
+    waits, for the one build every thread shares.
+
+    A version that fails to build (unreadable file, invalid schema) leaves
+    the current one in place; its exception is kept in ``errors``.
+    """
+
+    def __init__(self, root=SCHEMA_ROOT, stages=STAGES):
+        # Not imported with the module: load_schema alone does not need it.
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.root = root
+        self.stages = tuple(stages)
+        self.errors = {}
+        self._current = {}
+        self._failed = {}
+        self._pinned = {}
+        self._building = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="schema-registry")
+        self._watcher = None
+        self._stopped = threading.Event()
+
+    def _fingerprint(self, name):
+        path = schema_file(name, root=self.root)
+        stat = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def _build(self, name, version, fingerprint):
+        try:
+            schema = load_schema(name, version, self.root)
+            built = SchemaVersion(name, version, schema, fingerprint, self.stages)
+        except Exception as e:
+            self.errors[name] = (version, e)
+            raise
+        self.errors.pop(name, None)
+        return built
+
+    def _submit(self, key, build):
+        """Start ``build`` for ``key`` unless it is already being built."""
+        with self._lock:
+            future = self._building.get(key)
+            if future is not None:
+                return future
+            future = self._building[key] = self._executor.submit(build)
+        # Outside the lock: the callback runs at once if the build is done.
+        future.add_done_callback(lambda _: self._finished(key, future))
+        return future
+
+    def _finished(self, key, future):
+        with self._lock:
+            if self._building.get(key) is future:
+                del self._building[key]
+
+    def _build_latest(self, name):
+        fingerprint = self._fingerprint(name)
+        current = self._current.get(name)
+        if current is not None and current.fingerprint == fingerprint:
+            return current
+        version = os.path.basename(fingerprint[0])[: -len(_SUFFIX)]
+        try:
+            built = self._build(name, version, fingerprint)
+        except Exception:
+            # Not retried until the file changes again.
+            self._failed[name] = fingerprint
+            raise
+        # The one write readers see; they never take the lock.
+        self._current[name] = built
+        return built
+
+    def current(self, name):
+        """The current SchemaVersion of ``name``, building it on first use."""
+        current = self._current.get(name)
+        if current is None:
+            current = self._submit(name, lambda: self._build_latest(name)).result()
+        return current
+
+    def pinned(self, name, version):
+        """A given version of ``name``, built once and kept."""
+        key = (name, version)
+        built = self._pinned.get(key)
+        if built is None:
+            path = schema_file(name, version, self.root)
+            build = lambda: self._build(name, version, (path, None, None))
+            built = self._submit(key, build).result()
+            self._pinned[key] = built
+        return built
+
+    def validator(self, name, stage=None, version=None):
+        """Validator for a stage (or the whole schema, ``stage=None``) of ``name``.
+
+        The current version unless ``version`` pins one.
+        """
+        built = self.current(name) if version is None else self.pinned(name, version)
+        return built.validator(stage)
+
+    def schema(self, name, version=None):
+        built = self.current(name) if version is None else self.pinned(name, version)
+        return built.schema
+
+    def versions(self, name):
+        return schema_versions(name, self.root)
+
+    def refresh(self, name=None, wait=False):
+        """Rebuild the schemas whose latest file changed, in the background.
+
+        Checks ``name``, or every schema in use. Returns the futures of the
+        builds; with ``wait=True`` waits for them, raising if one failed.
+        """
+        names = [name] if name is not None else list(self._current)
+        futures = []
+        for name in names:
+            current = self._current.get(name)
+            try:
+                fingerprint = self._fingerprint(name)
+            except (OSError, LookupError) as e:
+                self.errors[name] = (None, e)
+                if wait:
+                    raise
+                continue
+            if self._failed.get(name) == fingerprint:
+                continue
+            if current is None or current.fingerprint != fingerprint:
+                futures.append(self._submit(name, lambda n=name: self._build_latest(n)))
+        if wait:
+            for future in futures:
+                future.result()
+        return futures
+
+    def watch(self, interval=5.0):
+        """Call refresh() every ``interval`` seconds from a daemon thread."""
+        if self._watcher is not None:
+            return
+
+        def run():
+            while not self._stopped.wait(interval):
+                self.refresh()
+
+        self._watcher = threading.Thread(
+            target=run, name="schema-registry-watch", daemon=True
+        )
+        self._watcher.start()
+
+    def close(self):
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
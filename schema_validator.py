@@ -0,0 +1,145 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+from validation_errors import Violation, title_index
+
+
+def schema_hash(schema):
+    # Canonical form so that key order in the literal does not change the hash.
+    canonical = json.dumps(
+        schema, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CompiledValidator:
+    """A schema checked against its metaschema and bound to a validator once.
+
+    Build it once per schema and share it: ``validate`` then only walks the
+    instance, instead of redoing the metaschema check, validator setup and
+    ``$ref`` resolution that ``jsonschema.validate`` performs on every call.
+    """
+
+    def __init__(self, schema):
+        # Imported here: jsonschema, and jsonref with the requests it pulls
+        # in, are only needed once a schema needs this fallback.
+        from jsonschema.validators import validator_for
+
+        from schema_flattener import flatten_schema
+
+        cls = validator_for(schema)
+        cls.check_schema(schema)
+        self.schema = schema
+        self.hash = schema_hash(schema)
+        try:
+            # Validate against the $ref-free form so no reference is
+            # resolved while walking instances.
+            self._validator = cls(flatten_schema(schema))
+        except ValueError:
+            self._validator = cls(schema)
+        self.titles = title_index(self._validator.schema)
+
+    def iter_errors(self, instance):
+        return self._validator.iter_errors(instance)
+
+    def is_valid(self, instance):
+        return self._validator.is_valid(instance)
+
+    def validate(self, instance):
+        # Same error selection as jsonschema.validate.
+        from jsonschema.exceptions import best_match
+
+        error = best_match(self._validator.iter_errors(instance))
+        if error is not None:
+            raise error
+
+    def errors(self, instance, limit=None):
+        """Return up to ``limit`` Violations for ``instance`` (empty if valid)."""
+        violations = []
+        missing = {}
+        for error in islice(self._validator.iter_errors(instance), limit):
+            schema_path = "#/" + "/".join(map(str, error.absolute_schema_path))
+            expected = error.validator_value
+            if error.validator == "required" and isinstance(error.instance, dict):
+                # jsonschema gives the whole list, one error per missing
+                # property in order; report that property, as codegen does.
+                key = (id(error.instance), schema_path)
+                if key not in missing:
+                    missing[key] = iter(
+                        [k for k in expected if k not in error.instance]
+                    )
+                expected = next(missing[key], expected)
+            violations.append(
+                Violation(
+                    tuple(error.absolute_path),
+                    error.validator,
+                    schema_path,
+                    error.instance,
+                    expected,
+                    error.message,
+                    self.titles,
+                )
+            )
+        return violations
+
+
+class SharedCache:
+    """Values built once per key (a schema hash) and shared by every caller.
+
+    ``get(key, build)`` returns the value stored for ``key``, calling
+    ``build()`` the first time. Lookups take no lock; builds are serialized,
+    so two threads never build the same value. Only the ``maxsize`` most
+    recently used values are kept, so the validators of schema versions a
+    registry has swapped out do not stay in memory for good.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        value = self._values.get(key)
+        if value is not None:
+            try:
+                self._values.move_to_end(key)
+            except KeyError:
+                # Evicted meanwhile; the caller still gets its value.
+                pass
+            return value
+        with self._lock:
+            value = self._values.get(key)
+            if value is None:
+                value = self._values[key] = build()
+                while len(self._values) > self.maxsize:
+                    self._values.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+
+_compiled = SharedCache()
+
+
+def compile_schema(schema):
+    """Return the shared CompiledValidator for ``schema``, building it once."""
+    return _compiled.get(schema_hash(schema), lambda: CompiledValidator(schema))
+
+
+__all__ = [
+    "CompiledValidator",
+    "SharedCache",
+    "compile_schema",
+    "schema_hash",
+]
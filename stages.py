@@ -0,0 +1,70 @@
+from codegen_validator import compile_validator
+from schema_validator import SharedCache, schema_hash
+
+STAGES = ("quote", "contract")
+
+_DEFINITION_REF = "#/definitions/"
+
+
+def _referenced_definitions(node, found):
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith(_DEFINITION_REF):
+            found.add(ref[len(_DEFINITION_REF) :].split("/", 1)[0])
+        for value in node.values():
+            _referenced_definitions(value, found)
+    elif isinstance(node, list):
+        for value in node:
+            _referenced_definitions(value, found)
+    return found
+
+
+def reachable_definitions(schema, stage):
+    """Names of the definitions a stage uses, directly or through others."""
+    definitions = schema["definitions"]
+    pending = _referenced_definitions(schema[stage], set())
+    reachable = set()
+    while pending:
+        name = pending.pop()
+        if name in reachable or name not in definitions:
+            continue
+        reachable.add(name)
+        pending |= _referenced_definitions(definitions[name], set())
+    return reachable
+
+
+def stage_schema(schema, stage):
+    """Build the JSON Schema for one stage's payload from the insurance schema.
+
+    ``schema[stage]`` maps each top-level field of the payload (e.g.
+    ``insurance_holder``) to its subschema, so the payload itself is an
+    object with those properties. Only the definitions the stage reaches
+    are kept, so e.g. the quote schema carries nothing that only the
+    contract uses.
+    """
+    if stage not in STAGES:
+        raise ValueError("unknown stage %r, expected one of %s" % (stage, STAGES))
+    definitions = schema["definitions"]
+    reachable = reachable_definitions(schema, stage)
+    return {
+        "type": "object",
+        "properties": schema[stage],
+        "definitions": {
+            name: value for name, value in definitions.items() if name in reachable
+        },
+    }
+
+
+_stage_validators = SharedCache()
+
+
+def compile_stage(schema, stage, compile=compile_validator):
+    """Return the shared validator for one stage of ``schema``.
+
+    Each stage gets its own compiled form, built from ``stage_schema``
+    alone: validating a quote never touches the contract subtree.
+    ``compile`` builds it from that schema (compile_streaming,
+    compile_profiled, ...); the default is compile_validator.
+    """
+    key = (schema_hash(schema), stage, compile)
+    return _stage_validators.get(key, lambda: compile(stage_schema(schema, stage)))
@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def validator_cache_dir(tmp_path, monkeypatch):
+    """Keep generated validators out of the real cache directory."""
+    directory = tmp_path / "validator-cache"
+    monkeypatch.setenv("VALIDATOR_CACHE_DIR", str(directory))
+    return directory
@@ -0,0 +1,108 @@
+import asyncio
+import json
+
+import pytest
+
+from async_validation import AsyncValidator, Overloaded, ValidationServer
+from codegen_validator import compile_memoized
+from schema_registry import load_schema
+from stages import compile_stage
+from testJsonschema import data_valid
+
+SCHEMA = load_schema("insurance")
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@pytest.mark.parametrize("memoize", [False, True])
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_check_and_check_body(executor, memoize):
+    async def main():
+        async with AsyncValidator(
+            SCHEMA, workers=2, executor=executor, memoize=memoize
+        ) as v:
+            assert await v.check("quote", data_valid["quote"]) == []
+            body = json.dumps(data_valid["quote"]).encode()
+            assert await v.check_body("quote", body) == []
+            errors = await v.check("quote", {"insurance_holder": 5})
+            assert [e["path"] for e in errors] == ["$.insurance_holder"]
+            with pytest.raises(ValueError):
+                await v.check_body("quote", b"{")
+            with pytest.raises(ValueError):
+                await v.check_body("quote", b"[" * 100000)
+            with pytest.raises(ValueError):
+                await v.check("nope", {})
+
+    _run(main())
+
+
+def test_thread_pool_uses_memoized_validators():
+    import async_validation
+
+    async def main():
+        async with AsyncValidator(SCHEMA, executor="thread", memoize=True):
+            pass
+
+    _run(main())
+    memoized = compile_stage(SCHEMA, "contract", compile_memoized)
+    assert async_validation._validators["contract"] is memoized
+
+
+def test_overloaded_without_waiting():
+    async def main():
+        async with AsyncValidator(
+            SCHEMA, workers=1, max_pending=1, executor="thread"
+        ) as v:
+            first = asyncio.ensure_future(v.check("quote", data_valid["quote"]))
+            await asyncio.sleep(0)
+            assert v.saturated
+            with pytest.raises(Overloaded):
+                await v.check("quote", data_valid["quote"], wait=False)
+            assert await first == []
+
+    _run(main())
+
+
+async def _request(port, method, target, body=b""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        b"%s %s HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s"
+        % (method.encode(), target.encode(), len(body), body)
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload
+
+
+def test_server_statuses():
+    async def main():
+        async with AsyncValidator(SCHEMA, workers=1, executor="thread") as v:
+            server = await ValidationServer(v, port=0, max_body=1 << 20).start()
+            try:
+                port = server.port
+                body = json.dumps(data_valid["quote"]).encode()
+                status, payload = await _request(port, "POST", "/validate/quote", body)
+                assert (status, json.loads(payload)) == (200, {"valid": True})
+                status, payload = await _request(
+                    port, "POST", "/validate/quote", b'{"insurance_holder": 5}'
+                )
+                assert status == 422 and not json.loads(payload)["valid"]
+                status, _ = await _request(port, "POST", "/validate/quote", b"{")
+                assert status == 400
+                status, payload = await _request(
+                    port, "POST", "/validate/quote", b"[" * 100000
+                )
+                assert status == 400
+                assert b"invalid JSON" in payload
+                assert (await _request(port, "GET", "/validate/quote"))[0] == 405
+                assert (await _request(port, "POST", "/nope"))[0] == 404
+                status, payload = await _request(port, "GET", "/metrics")
+                assert status == 200 and b"payload_validations_total" in payload
+            finally:
+                await server.close()
+
+    _run(main())
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import bulk_validation
+
+
+def test_stage_is_required(tmp_path):
+    path = tmp_path / "payloads.jsonl"
+    path.write_text("{}\n")
+    with pytest.raises(SystemExit) as raised:
+        bulk_validation.main([str(path)])
+    assert raised.value.code == 2
+
+
+def test_payloads_that_are_not_stage_documents_fail(tmp_path, capsys):
+    path = tmp_path / "payloads.jsonl"
+    path.write_text('{"insurance_holder":5}\n[1,2]\n"str"\n')
+    status = bulk_validation.main(
+        ["--stage", "quote", "--workers", "1", "--no-progress", str(path)]
+    )
+    assert status == 1
+    failures = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [failure["line"] for failure in failures] == [1, 2, 3]
+
+
+def test_deeply_nested_lines_are_malformed(tmp_path, capsys):
+    path = tmp_path / "payloads.jsonl"
+    path.write_text('{"insurance_holder":5}\n' + "[" * 100000 + "\n")
+    output = tmp_path / "failures.jsonl"
+    status = bulk_validation.main(
+        [
+            "--stage",
+            "quote",
+            "--workers",
+            "1",
+            "--no-progress",
+            "-o",
+            str(output),
+            str(path),
+        ]
+    )
+    assert status == 1
+    failures = [json.loads(line) for line in output.read_text("utf-8").splitlines()]
+    assert [failure["line"] for failure in failures] == [1, 2]
+    assert failures[1]["error"].startswith("invalid JSON")
+    summary = capsys.readouterr().err
+    assert "malformed             1" in summary
+
+
+def test_output_file_is_utf8_whatever_the_locale(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    path = tmp_path / "payloads.jsonl"
+    path.write_text('{"insurance_holder": "ção"}\n', "utf-8")
+    output = tmp_path / "failures.jsonl"
+    # An ASCII locale, without Python's coercion to UTF-8.
+    env = dict(os.environ, LC_ALL="C", PYTHONCOERCECLOCALE="0", PYTHONUTF8="0")
+    result = subprocess.run(
+        [sys.executable, bulk_validation.__file__, "--stage", "quote"]
+        + ["--workers", "1", "-o", str(output), str(path)],
+        env=env,
+        capture_output=True,
+    )
+    assert result.returncode == 1, result.stderr
+    failure = json.loads(output.read_text("utf-8"))
+    assert "ção" in failure["errors"][0]["message"]
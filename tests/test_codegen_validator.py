@@ -0,0 +1,237 @@
+import copy
+
+import pytest
+from jsonschema import Draft202012Validator
+
+from codegen_validator import CodegenValidator, compile_validator, generate_source
+from schema_registry import load_schema
+from schema_validator import CompiledValidator
+from stages import stage_schema
+from testJsonschema import data_valid
+
+SCHEMA = load_schema("insurance")
+
+
+def _summary(violations):
+    return {(v.path, v.keyword) for v in violations}
+
+
+def _jsonschema_summary(schema, instance):
+    # A set: jsonschema reports a keyword that both a $ref target and its
+    # siblings carry once for each, the flattened schema once.
+    return {
+        (tuple(error.absolute_path), error.validator)
+        for error in Draft202012Validator(schema).iter_errors(instance)
+    }
+
+
+def _quotes():
+    quote = data_valid["quote"]
+    yield quote
+    for path, value in [
+        (("insurance_holder",), 5),
+        (("insurance_holder", "birth_date"), 5),
+        (("insurance_holder", "birth_date"), None),
+    ]:
+        payload = copy.deepcopy(quote)
+        node = payload
+        for key in path[:-1]:
+            node = node[key]
+        node[path[-1]] = value
+        yield payload
+    payload = copy.deepcopy(quote)
+    del payload["insurance_holder"]["birth_date"]
+    yield payload
+    yield {}
+    yield []
+
+
+@pytest.mark.parametrize("payload", list(_quotes()))
+def test_quote_agrees_with_jsonschema(payload):
+    schema = stage_schema(SCHEMA, "quote")
+    validator = CodegenValidator(schema)
+    expected = Draft202012Validator(schema).is_valid(payload)
+    assert validator.is_valid(payload) is expected
+    assert _summary(validator.errors(payload)) == _jsonschema_summary(schema, payload)
+
+
+def test_contract_errors_agree_with_jsonschema():
+    schema = stage_schema(SCHEMA, "contract")
+    payload = data_valid["contract"]
+    violations = CodegenValidator(schema).errors(payload)
+    assert violations
+    assert _summary(violations) == _jsonschema_summary(schema, payload)
+
+
+def test_error_limit():
+    schema = stage_schema(SCHEMA, "contract")
+    payload = data_valid["contract"]
+    validator = CodegenValidator(schema)
+    assert len(validator.errors(payload, 1)) == 1
+    assert len(validator.errors(payload)) > 1
+
+
+def test_definitions_are_exposed():
+    validator = CodegenValidator(SCHEMA)
+    address = data_valid["contract"]["insurance_holder"]["addresses"][0]
+    assert validator.definitions["address"](address)
+    assert not validator.definitions["address"](5)
+
+
+NAMES = [
+    'a\n    print("INJECTED")',
+    "x\ny",
+    "\r",
+    "'''",
+    '"""',
+    "\\",
+    "~1/",
+    "\x00",
+]
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_property_and_definition_names_stay_data(name, capsys):
+    schema = {
+        "type": "object",
+        "properties": {
+            name: {
+                "$ref": "#/definitions/%s" % name.replace("~", "~0").replace("/", "~1")
+            }
+        },
+        "required": [name],
+        "definitions": {name: {"type": "object", "required": [name]}},
+    }
+    validator = CodegenValidator(schema)
+    assert "INJECTED" not in capsys.readouterr().out
+    for instance in ({}, {name: {}}, {name: {name: 1}}, {name: 5}):
+        expected = Draft202012Validator(schema).is_valid(instance)
+        assert validator.is_valid(instance) is expected
+        assert _summary(validator.errors(instance)) == _jsonschema_summary(
+            schema, instance
+        )
+    assert "INJECTED" not in capsys.readouterr().out
+
+
+def test_definition_names_that_fold_together_stay_apart():
+    # NFKC folds "𝔘" to "U" in identifiers.
+    schema = {
+        "definitions": {"U": {"type": "string"}, "𝔘": {"type": "integer"}},
+    }
+    validator = CodegenValidator(schema)
+    assert validator.definitions["U"]("a") and not validator.definitions["U"](1)
+    assert validator.definitions["𝔘"](1) and not validator.definitions["𝔘"]("a")
+
+
+def test_unsupported_schemas_fall_back_to_jsonschema():
+    schema = {"$schema": "http://json-schema.org/draft-07/schema#", "type": "string"}
+    with pytest.raises(ValueError):
+        generate_source(schema)
+    assert isinstance(compile_validator(schema), CompiledValidator)
+
+
+LEAVES = {
+    "type": "object",
+    "required": ["name", "active"],
+    "properties": {
+        "name": {"type": "string", "titles": {"pt-br": "Nome"}},
+        "nickname": {"type": "string"},
+        "active": {"type": "boolean"},
+        "deleted": {"type": "boolean"},
+        "parent": {"type": "null"},
+    },
+}
+
+LEAF_VALUES = ["", "x", 0, 1, 1.5, True, False, None, [], {}, [""], {"": ""}]
+
+
+def _leaf_payloads():
+    base = {"name": "n", "active": True}
+    yield base
+    for key in LEAVES["properties"]:
+        missing = dict(base)
+        missing.pop(key, None)
+        yield missing
+        for value in LEAF_VALUES:
+            yield dict(base, **{key: value})
+
+
+def test_leaves_take_the_fast_path():
+    source = generate_source(LEAVES)
+    assert "isinstance(v.get('nickname', ''), str)" in source
+    assert "isinstance(v.get('deleted', False), bool)" in source
+    assert "v.get('parent', None) is None" in source
+
+
+@pytest.mark.parametrize("memoize", [False, True])
+@pytest.mark.parametrize("payload", list(_leaf_payloads()), ids=repr)
+def test_missing_and_mistyped_leaves_agree_with_jsonschema(payload, memoize):
+    validator = CodegenValidator(LEAVES, memoize)
+    expected = _jsonschema_summary(LEAVES, payload)
+    assert validator.is_valid(payload) == (not expected)
+    assert _summary(validator.errors(payload)) == expected
+
+
+def _memo_hits(validator, monkeypatch):
+    # Wraps the generated code's memoized_call to record the calls it
+    # answered from the memo.
+    namespace = validator.is_valid.__globals__
+    call = namespace["_memo"]
+    hits = []
+
+    def memo(fn, v, memo):
+        if (fn, id(v)) in memo:
+            hits.append(fn.__name__)
+        return call(fn, v, memo)
+
+    monkeypatch.setitem(namespace, "_memo", memo)
+    return hits
+
+
+def _contract(phones):
+    contract = copy.deepcopy(data_valid["contract"])
+    holder = contract["insurance_holder"]
+    holder.update(name="Ana", cpf="000.000.000-00", email="ana@example.com")
+    holder["phones"] = phones(holder["phones"][0])
+    return contract
+
+
+def test_memoized_validator_checks_a_repeated_object_once(monkeypatch):
+    validator = compile_validator(stage_schema(SCHEMA, "contract"), memoize=True)
+    hits = _memo_hits(validator, monkeypatch)
+    # Each phone is reached through more than one $ref, so distinct
+    # phones already hit the memo; the same phone three times hits it for
+    # the two repeats on top of that.
+    assert validator.is_valid(_contract(lambda phone: [dict(phone) for _ in "abc"]))
+    distinct = hits.count("def_phone")
+    del hits[:]
+    shared = _contract(lambda phone: [phone] * 3)
+    assert validator.is_valid(shared)
+    assert hits.count("def_phone") == distinct + 2
+    # A fresh memo for every run.
+    del hits[:]
+    assert validator.is_valid(shared)
+    assert hits.count("def_phone") == distinct + 2
+
+
+def test_memoization_only_recognizes_the_same_object(monkeypatch):
+    validator = compile_validator(stage_schema(SCHEMA, "contract"), memoize=True)
+    hits = _memo_hits(validator, monkeypatch)
+    assert validator.is_valid(_contract(lambda phone: [phone]))
+    single = hits.count("def_phone")
+    del hits[:]
+    # Equal but distinct phones are each checked in full.
+    assert validator.is_valid(_contract(lambda phone: [dict(phone) for _ in "abc"]))
+    assert hits.count("def_phone") == 3 * single
+
+
+def test_memoized_validator_agrees_with_the_flattened_one():
+    schema = stage_schema(SCHEMA, "contract")
+    memoized = compile_validator(schema, memoize=True)
+    flattened = compile_validator(schema)
+    assert memoized is not flattened
+    contract = _contract(lambda phone: [phone, phone])
+    assert memoized.is_valid(contract) and flattened.is_valid(contract)
+    contract["insurance_holder"]["phones"][0]["area_code"] = 5
+    assert not memoized.is_valid(contract)
+    assert _summary(memoized.errors(contract)) == _summary(flattened.errors(contract))
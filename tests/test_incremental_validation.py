@@ -0,0 +1,24 @@
+from codegen_validator import compile_validator
+from incremental_validation import IncrementalValidator
+
+ALL_OF = {"type": "object", "allOf": [{"properties": {"a": {"type": "string"}}}]}
+
+
+def _summary(violations):
+    return sorted((v.json_path, v.keyword, v.schema_path) for v in violations)
+
+
+def test_allof_violations_are_reported_once():
+    validator = IncrementalValidator(ALL_OF)
+    state = validator.validate({"a": 1})
+    expected = _summary(compile_validator(ALL_OF).errors({"a": 1}))
+    assert len(expected) == 1
+    assert _summary(state.violations) == expected
+    for patch in (
+        [{"op": "add", "path": "/c", "value": 1}],
+        [{"op": "remove", "path": "/a"}, {"op": "add", "path": "/a", "value": 2}],
+        [{"op": "replace", "path": "", "value": {"a": 3}}],
+    ):
+        patched = validator.revalidate(state, patch)
+        fresh = compile_validator(ALL_OF).errors(patched.document)
+        assert _summary(patched.violations) == _summary(fresh)
@@ -0,0 +1,33 @@
+import io
+import json
+
+from jsonl_validation import validate_jsonl
+from schema_registry import load_schema
+from testJsonschema import data_valid
+
+SCHEMA = load_schema("insurance")
+
+
+def test_every_line_is_reported(tmp_path):
+    path = tmp_path / "quotes.jsonl"
+    lines = [
+        json.dumps(data_valid["quote"]),
+        "",
+        '{"insurance_holder": 5}',
+        "{",
+        "[" * 100000,
+        json.dumps(data_valid["quote"]),
+    ]
+    path.write_text("\n".join(lines) + "\n")
+    output = io.StringIO()
+    counts = validate_jsonl(str(path), SCHEMA, "quote", output)
+    assert counts == {"records": 5, "valid": 2, "invalid": 1, "malformed": 2}
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [(r["line"], r["valid"]) for r in results] == [
+        (1, True),
+        (3, False),
+        (4, False),
+        (5, False),
+        (6, True),
+    ]
+    assert results[3]["error"].startswith("invalid JSON")
@@ -0,0 +1,26 @@
+import threading
+
+from metrics import Counter, Histogram
+
+
+def _in_threads(count, fn):
+    for _ in range(count):
+        thread = threading.Thread(target=fn)
+        thread.start()
+        thread.join()
+
+
+def test_finished_threads_leave_their_values_not_their_shards():
+    counter = Counter("c", "help", ("stage",))
+    histogram = Histogram("h", "help", ("stage",), buckets=(1.0, 2.0))
+
+    def record():
+        counter.inc(("quote",))
+        histogram.observe(1.5, ("quote",))
+
+    _in_threads(300, record)
+    record()
+    assert len(counter._shards) <= 2
+    assert len(histogram._shards) <= 2
+    assert counter.values() == {("quote",): 301}
+    assert histogram.values() == {("quote",): [0, 301, 0, 301 * 1.5]}
@@ -0,0 +1,46 @@
+import copy
+
+import pytest
+
+from batch_validation import validate_batch
+from parallel_validation import ParallelValidator, validate_parallel
+from schema_registry import load_schema
+from testJsonschema import data_valid
+
+SCHEMA = load_schema("insurance")
+
+
+def _quotes(count):
+    quotes = []
+    for i in range(count):
+        quote = copy.deepcopy(data_valid["quote"])
+        if i % 3 == 1:
+            quote["insurance_holder"]["birth_date"] = i
+        quotes.append(quote)
+    return quotes
+
+
+def test_pool_agrees_with_validate_batch_in_input_order():
+    quotes = _quotes(50)
+    expected = validate_batch(quotes, SCHEMA, "quote")
+    with ParallelValidator(SCHEMA, workers=2, chunk_size=7, stage="quote") as pool:
+        result = pool.validate(quotes)
+        assert result.valid == expected.valid
+        assert list(result.invalid) == list(range(1, 50, 3))
+        # The pool is reused between batches.
+        assert pool.validate(quotes[:3]).valid == expected.valid[:3]
+        assert len(pool.validate([])) == 0
+
+
+def test_validate_parallel_one_shot():
+    contract = copy.deepcopy(data_valid["contract"])
+    # data_valid's contract lacks these.
+    contract["insurance_holder"].update(name="n", cpf="c", email="e")
+    contracts = [contract, data_valid["contract"]]
+    result = validate_parallel(contracts, SCHEMA, workers=2, stage="contract")
+    assert list(result.invalid) == [1]
+
+
+def test_chunk_size_must_be_positive():
+    with pytest.raises(ValueError):
+        ParallelValidator(SCHEMA, workers=1, chunk_size=0)
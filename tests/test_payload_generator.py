@@ -0,0 +1,75 @@
+import io
+import json
+
+import pytest
+
+from codegen_validator import compile_validator
+from payload_generator import PayloadGenerator
+from schema_registry import load_schema
+from stages import stage_schema
+
+SCHEMA = load_schema("insurance")
+
+
+@pytest.mark.parametrize("stage", ["quote", "contract"])
+def test_valid_payloads_validate(stage):
+    validator = compile_validator(stage_schema(SCHEMA, stage))
+    generator = PayloadGenerator(SCHEMA, stage=stage, seed=1)
+    for _ in range(200):
+        payload = generator.valid()
+        assert validator.is_valid(payload), list(validator.errors(payload))
+
+
+@pytest.mark.parametrize("stage", ["quote", "contract"])
+def test_invalid_payloads_do_not_validate(stage):
+    validator = compile_validator(stage_schema(SCHEMA, stage))
+    generator = PayloadGenerator(SCHEMA, stage=stage, seed=2)
+    for _ in range(100):
+        assert not validator.is_valid(generator.invalid())
+
+
+def test_car_years_are_strings():
+    generator = PayloadGenerator(SCHEMA, definition="risk_car", seed=3, optional=1.0)
+    for _ in range(20):
+        car = generator.valid()
+        for name in ("manufacture_year", "model_year"):
+            assert isinstance(car[name], str) and car[name].isdigit()
+
+
+def test_same_seed_same_payloads():
+    def run(seed):
+        generator = PayloadGenerator(SCHEMA, stage="contract", seed=seed)
+        return list(generator.generate(50, invalid_rate=0.3))
+
+    first = run(7)
+    assert run(7) == first
+    assert run(8) != first
+    assert {valid for _, valid in first} == {True, False}
+
+
+def test_array_sizes():
+    generator = PayloadGenerator(
+        SCHEMA, stage="contract", seed=4, array_sizes={"phones": 5}, items=(0, 0)
+    )
+    holder = generator.valid()["insurance_holder"]
+    assert len(holder["phones"]) == 5
+    assert holder["addresses"] == []
+
+
+def test_write_jsonl_counts_records():
+    generator = PayloadGenerator(SCHEMA, stage="quote", seed=5)
+    output = io.StringIO()
+    counts = generator.write_jsonl(output, 30, invalid_rate=0.5, batch=7)
+    lines = output.getvalue().splitlines()
+    assert len(lines) == counts["records"] == 30
+    assert counts["valid"] + counts["invalid"] == 30
+    validator = compile_validator(stage_schema(SCHEMA, "quote"))
+    valid = sum(validator.is_valid(json.loads(line)) for line in lines)
+    assert valid == counts["valid"]
+
+
+def test_false_schema_cannot_be_generated():
+    with pytest.raises(ValueError):
+        PayloadGenerator(
+            {"type": "object", "required": ["a"], "properties": {"a": False}}
+        )
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+from jsonschema import ValidationError
+
+from result_cache import CachedValidator, ResultCache, body_key, payload_key
+from schema_registry import load_schema
+from stages import compile_stage
+from testJsonschema import data_valid
+from validation import check_payload, validate_bytes, validate_payload
+
+SCHEMA = load_schema("insurance")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_is_evicted():
+    cache = ResultCache(maxsize=2, ttl=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = ResultCache(ttl=10.0, clock=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10.0
+    assert cache.get("a", "gone") == "gone"
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_keys():
+    payload = {"b": 1, "a": [1, 2]}
+    reordered = {"a": [1, 2], "b": 1}
+    assert payload_key(payload, "v1") == payload_key(reordered, "v1")
+    assert payload_key(payload, "v1") != payload_key(payload, "v2")
+    body = json.dumps(payload)
+    assert body_key(body, "v1") == body_key(body.encode(), "v1")
+    assert body_key(body, "v1") == body_key(memoryview(body.encode()), "v1")
+    # A str payload is a JSON string, not a body.
+    assert payload_key(body, "v1") != body_key(body, "v1")
+    assert payload_key(json.loads(body), "v1") != body_key(body, "v1")
+
+
+def test_string_payload_does_not_reuse_its_body_verdict():
+    cache = ResultCache()
+    body = json.dumps(data_valid["quote"])
+    validate_bytes(body.encode(), SCHEMA, stage="quote", cache=cache)
+    with pytest.raises(ValidationError):
+        validate_payload(body, SCHEMA, stage="quote", cache=cache)
+
+
+def test_cached_errors_are_fresh_and_hold_no_payload():
+    cache = ResultCache()
+    payload = data_valid["contract"]
+    first = check_payload(payload, SCHEMA, "collect_all", stage="contract", cache=cache)
+    second = check_payload(
+        payload, SCHEMA, "collect_all", stage="contract", cache=cache
+    )
+    third = check_payload(payload, SCHEMA, "collect_all", stage="contract", cache=cache)
+    assert second is not third
+    assert second[0] is not third[0]
+    assert [(v.path, v.keyword, v.message) for v in first] == [
+        (v.path, v.keyword, v.message) for v in second
+    ]
+    assert [v.localized() for v in first] == [v.localized() for v in second]
+    containers = set()
+
+    def collect(node):
+        if isinstance(node, (dict, list)):
+            containers.add(id(node))
+            for value in node.values() if isinstance(node, dict) else node:
+                collect(value)
+
+    collect(payload)
+    for _, value in cache._entries.values():
+        if isinstance(value, tuple):
+            assert not any(id(item) in containers for row in value for item in row)
+
+
+def test_cached_validator_verdicts():
+    cache = ResultCache()
+    validator = CachedValidator(compile_stage(SCHEMA, "quote"), cache)
+    assert validator.is_valid(data_valid["quote"])
+    assert validator.is_valid(data_valid["quote"])
+    assert not validator.is_valid({"insurance_holder": 5})
+    with pytest.raises(ValidationError):
+        validator.validate({"insurance_holder": 5})
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+from jsonschema import Draft202012Validator, ValidationError
+
+from bytes_validation import StreamingValidator
+from codegen_validator import CodegenValidator
+from schema_flattener import flatten
+from schema_registry import load_schema
+from schema_validator import CompiledValidator
+
+# p -> b, and b is itself a $ref (to a) with a keyword of its own.
+REF_TO_REF = {
+    "definitions": {
+        "a": {"type": "object"},
+        "b": {"$ref": "#/definitions/a", "required": ["x"]},
+    },
+    "properties": {"p": {"$ref": "#/definitions/b"}},
+}
+
+
+def test_ref_to_ref_keeps_the_inner_siblings():
+    flat = flatten(REF_TO_REF)
+    assert flat["properties"]["p"] == {"type": "object", "required": ["x"]}
+
+
+@pytest.mark.parametrize("instance", [{"p": {}}, {"p": {"x": 1}}])
+def test_ref_to_ref_validators_agree_with_jsonschema(instance):
+    expected = Draft202012Validator(REF_TO_REF).is_valid(instance)
+    assert expected is ("x" in instance["p"])
+    assert CodegenValidator(REF_TO_REF).is_valid(instance) is expected
+    assert CompiledValidator(REF_TO_REF).is_valid(instance) is expected
+    streaming = StreamingValidator(REF_TO_REF)
+    if expected:
+        streaming.validate(json.dumps(instance))
+    else:
+        with pytest.raises(ValidationError):
+            streaming.validate(json.dumps(instance))
+
+
+def test_insurance_holder_keeps_its_own_title():
+    flat = flatten(load_schema("insurance"))
+    for stage in ("quote", "contract"):
+        holder = flat[stage]["insurance_holder"]
+        assert holder["titles"] == {"pt-br": "Segurado"}
+
+
+# A property named like a data keyword is still a subschema.
+DATA_KEYWORD_NAME = {
+    "properties": {"default": {"$ref": "#/definitions/x", "required": ["z"]}},
+    "definitions": {"x": {"type": "object"}},
+}
+
+
+def test_properties_named_like_data_keywords_are_flattened():
+    flat = flatten(DATA_KEYWORD_NAME)
+    assert flat["properties"]["default"] == {"type": "object", "required": ["z"]}
+
+
+@pytest.mark.parametrize("instance", [{"default": {}}, {"default": {"z": 1}}])
+def test_properties_named_like_data_keywords_are_validated(instance):
+    from profiling import compile_profiled
+
+    expected = Draft202012Validator(DATA_KEYWORD_NAME).is_valid(instance)
+    assert expected is ("z" in instance["default"])
+    profiled = compile_profiled(DATA_KEYWORD_NAME)
+    for validator in (
+        CodegenValidator(DATA_KEYWORD_NAME),
+        CompiledValidator(DATA_KEYWORD_NAME),
+        profiled,
+    ):
+        assert validator.is_valid(instance) is expected
+        assert (not validator.errors(instance)) is expected
+    streaming = StreamingValidator(DATA_KEYWORD_NAME)
+    if expected:
+        streaming.validate(json.dumps(instance))
+    else:
+        with pytest.raises(ValidationError):
+            streaming.validate(json.dumps(instance))
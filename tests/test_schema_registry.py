@@ -0,0 +1,125 @@
+import json
+import os
+
+import pytest
+
+import stages
+from schema_registry import SchemaRegistry, load_schema, schema_file, schema_versions
+from schema_validator import SharedCache
+
+
+def _schema(holder_type):
+    return {
+        "definitions": {"holder": {"type": holder_type}},
+        "quote": {"holder": {"$ref": "#/definitions/holder"}},
+        "contract": {"holder": {"$ref": "#/definitions/holder"}},
+    }
+
+
+def _write(root, version, schema, name="policy"):
+    directory = root / name
+    directory.mkdir(exist_ok=True)
+    path = directory / ("%s.json" % version)
+    path.write_text(schema if isinstance(schema, str) else json.dumps(schema))
+    return path
+
+
+def test_versions_sort_numerically(tmp_path):
+    for version in ("1", "10", "9", "1.10", "1.9"):
+        _write(tmp_path, version, _schema("string"))
+    assert schema_versions("policy", tmp_path) == ["1", "1.9", "1.10", "9", "10"]
+    assert schema_file("policy", root=tmp_path).endswith("10.json")
+    assert schema_versions("missing", tmp_path) == []
+    with pytest.raises(LookupError):
+        schema_file("missing", root=tmp_path)
+
+
+def test_load_schema_reads_latest_or_given_version(tmp_path):
+    _write(tmp_path, "1", _schema("string"))
+    _write(tmp_path, "2", _schema("integer"))
+    assert load_schema("policy", root=tmp_path) == _schema("integer")
+    assert load_schema("policy", "1", tmp_path) == _schema("string")
+
+
+def test_registry_serves_the_latest_version(tmp_path):
+    _write(tmp_path, "1", _schema("string"))
+    with SchemaRegistry(tmp_path) as registry:
+        assert registry.current("policy").version == "1"
+        assert registry.validator("policy", "quote").is_valid({"holder": "x"})
+        assert not registry.validator("policy", "quote").is_valid({"holder": 1})
+        assert registry.schema("policy") == _schema("string")
+        with pytest.raises(ValueError):
+            registry.validator("policy", "claim")
+
+
+def test_new_version_is_swapped_in_and_old_validators_keep_working(tmp_path):
+    _write(tmp_path, "1", _schema("string"))
+    with SchemaRegistry(tmp_path) as registry:
+        old = registry.validator("policy", "quote")
+        assert registry.refresh(wait=True) == []
+        _write(tmp_path, "2", _schema("integer"))
+        assert len(registry.refresh(wait=True)) == 1
+        assert registry.current("policy").version == "2"
+        assert registry.validator("policy", "quote").is_valid({"holder": 1})
+        # A caller holding the old validator still validates version 1.
+        assert old.is_valid({"holder": "x"})
+        assert not old.is_valid({"holder": 1})
+
+
+def test_changed_file_is_rebuilt(tmp_path):
+    path = _write(tmp_path, "1", _schema("string"))
+    with SchemaRegistry(tmp_path) as registry:
+        first = registry.current("policy")
+        path.write_text(json.dumps(_schema("boolean"), indent=2))
+        os.utime(path, ns=(first.fingerprint[1] + 10**9,) * 2)
+        registry.refresh("policy", wait=True)
+        assert registry.current("policy") is not first
+        assert registry.validator("policy", "quote").is_valid({"holder": True})
+
+
+def test_failed_build_keeps_the_current_version(tmp_path):
+    _write(tmp_path, "1", _schema("string"))
+    with SchemaRegistry(tmp_path) as registry:
+        current = registry.current("policy")
+        _write(tmp_path, "2", "{not json")
+        with pytest.raises(ValueError):
+            registry.refresh(wait=True)
+        assert registry.current("policy") is current
+        assert registry.errors["policy"][0] == "2"
+        # Not retried until the file changes again.
+        assert registry.refresh(wait=True) == []
+        _write(tmp_path, "2", _schema("integer"))
+        registry.refresh(wait=True)
+        assert registry.current("policy").version == "2"
+        assert "policy" not in registry.errors
+
+
+def test_pinned_version(tmp_path):
+    _write(tmp_path, "1", _schema("string"))
+    _write(tmp_path, "2", _schema("integer"))
+    with SchemaRegistry(tmp_path) as registry:
+        pinned = registry.validator("policy", "quote", version="1")
+        assert pinned is registry.validator("policy", "quote", version="1")
+        assert pinned.is_valid({"holder": "x"})
+        assert registry.validator("policy", "quote").is_valid({"holder": 1})
+        assert registry.versions("policy") == ["1", "2"]
+
+
+def test_reloads_do_not_keep_every_version_compiled(tmp_path):
+    with SchemaRegistry(tmp_path) as registry:
+        for version in range(1, 3 * stages._stage_validators.maxsize):
+            schema = _schema("string")
+            schema["$comment"] = "version %d" % version
+            _write(tmp_path, version, schema)
+            registry.refresh("policy", wait=True)
+        assert len(stages._stage_validators) <= stages._stage_validators.maxsize
+
+
+def test_shared_cache_evicts_least_recently_used():
+    cache = SharedCache(maxsize=2)
+    cache.get("a", lambda: "A")
+    cache.get("b", lambda: "B")
+    assert cache.get("a", lambda: "rebuilt") == "A"
+    cache.get("c", lambda: "C")
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.get("b", lambda: "rebuilt") == "rebuilt"
@@ -0,0 +1,99 @@
+import json
+import threading
+
+import pytest
+
+from schema_registry import load_schema
+from schema_validator import SharedCache
+from stages import compile_stage, reachable_definitions, stage_schema
+
+# a -> b -> c, d is used by nothing, e only by the contract.
+SCHEMA = {
+    "definitions": {
+        "a": {"properties": {"b": {"$ref": "#/definitions/b"}}},
+        "b": {"items": {"$ref": "#/definitions/c/properties/x"}},
+        "c": {"properties": {"x": {"type": "string"}}},
+        "d": {"type": "integer"},
+        "e": {"type": "boolean"},
+    },
+    "quote": {"holder": {"$ref": "#/definitions/a"}},
+    "contract": {
+        "holder": {"$ref": "#/definitions/a"},
+        "flag": {"$ref": "#/definitions/e"},
+    },
+}
+
+
+def test_reachable_definitions_are_transitive():
+    assert reachable_definitions(SCHEMA, "quote") == {"a", "b", "c"}
+    assert reachable_definitions(SCHEMA, "contract") == {"a", "b", "c", "e"}
+
+
+def test_reachable_definitions_ignore_missing_and_cyclic_references():
+    schema = {
+        "definitions": {
+            "a": {"$ref": "#/definitions/b"},
+            "b": {"items": {"$ref": "#/definitions/a"}},
+        },
+        "quote": {
+            "p": {"$ref": "#/definitions/a"},
+            "q": {"$ref": "#/definitions/gone"},
+        },
+    }
+    assert reachable_definitions(schema, "quote") == {"a", "b"}
+
+
+def test_stage_schema_keeps_only_reachable_definitions():
+    quote = stage_schema(SCHEMA, "quote")
+    assert quote == {
+        "type": "object",
+        "properties": SCHEMA["quote"],
+        "definitions": {name: SCHEMA["definitions"][name] for name in "abc"},
+    }
+    assert set(stage_schema(SCHEMA, "contract")["definitions"]) == set("abce")
+
+
+def test_stage_schema_rejects_unknown_stage():
+    with pytest.raises(ValueError, match="unknown stage"):
+        stage_schema(SCHEMA, "claim")
+
+
+def test_stage_schema_of_the_insurance_schema_resolves():
+    schema = load_schema("insurance")
+    for stage in ("quote", "contract"):
+        validator = compile_stage(schema, stage)
+        assert validator.is_valid({})
+        assert not validator.is_valid({"insurance_holder": 5})
+
+
+def test_compile_stage_shares_validators_between_copies():
+    schema = load_schema("insurance")
+    copy = json.loads(json.dumps(schema))
+    assert compile_stage(schema, "quote") is compile_stage(copy, "quote")
+    assert compile_stage(schema, "quote") is not compile_stage(schema, "contract")
+
+
+def test_shared_cache_builds_each_key_once():
+    cache = SharedCache()
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def build():
+        calls.append(1)
+        return object()
+
+    def get():
+        barrier.wait()
+        results.append(cache.get("k", build))
+
+    results = []
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert "k" in cache and len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+from jsonschema import ValidationError
+
+from result_cache import ResultCache
+from testJsonschema import data_valid
+from schema_registry import load_schema
+from validation import validate_bytes
+
+SCHEMA = load_schema("insurance")
+
+
+def _bodies():
+    quote = data_valid["quote"]
+    invalid = json.loads(json.dumps(quote))
+    invalid["insurance_holder"]["birth_date"] = 5
+    return [
+        (json.dumps(quote).encode(), True),
+        (json.dumps(invalid).encode(), False),
+    ]
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.parametrize("wrap", [bytes, memoryview, bytes.decode])
+def test_validate_bytes(streaming, wrap):
+    for body, valid in _bodies():
+        if valid:
+            document = validate_bytes(
+                wrap(body), SCHEMA, stage="quote", streaming=streaming
+            )
+            assert document == json.loads(body)
+        else:
+            with pytest.raises(ValidationError) as raised:
+                validate_bytes(wrap(body), SCHEMA, stage="quote", streaming=streaming)
+            assert list(raised.value.absolute_path) == [
+                "insurance_holder",
+                "birth_date",
+            ]
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_validate_bytes_malformed(streaming):
+    with pytest.raises(json.JSONDecodeError):
+        validate_bytes(
+            b'{"insurance_holder": ', SCHEMA, stage="quote", streaming=streaming
+        )
+
+
+def test_validate_bytes_cached():
+    cache = ResultCache()
+    for _ in range(2):
+        for body, valid in _bodies():
+            if valid:
+                validate_bytes(body, SCHEMA, stage="quote", cache=cache)
+            else:
+                with pytest.raises(ValidationError):
+                    validate_bytes(body, SCHEMA, stage="quote", cache=cache)
+
+
+def test_validators_do_not_pile_up_for_copies_of_a_schema():
+    import stages
+    import validation
+
+    quote = data_valid["quote"]
+    before = set(stages._stage_validators._values)
+    for _ in range(100):
+        copy = json.loads(json.dumps(SCHEMA))
+        validation.validate_payload(quote, copy, stage="quote")
+    assert len(validation._recent) <= validation._RECENT_SIZE
+    assert len(set(stages._stage_validators._values) - before) <= 1
+
+
+def test_fail_fast_is_streaming_only():
+    body = json.dumps(data_valid["quote"]).encode()
+    for fail_fast in (True, False):
+        with pytest.raises(ValueError):
+            validate_bytes(body, SCHEMA, fail_fast=fail_fast, stage="quote")
+        validate_bytes(body, SCHEMA, fail_fast=fail_fast, stage="quote", streaming=True)
+
+
+def test_memoize_selects_the_memoized_stage_validator():
+    from batch_validation import batch_validator, validate_batch
+    from codegen_validator import compile_memoized
+    from stages import compile_stage
+    from validation import check_payload, validate_payload
+
+    memoized = compile_stage(SCHEMA, "contract", compile_memoized)
+    assert batch_validator(SCHEMA, "contract", memoize=True) is memoized
+    assert batch_validator(SCHEMA, "contract") is not memoized
+    assert batch_validator(SCHEMA, memoize=True) is compile_memoized(SCHEMA)
+
+    quote = data_valid["quote"]
+    invalid = {"insurance_holder": {"birth_date": 5}}
+    assert validate_payload(quote, SCHEMA, stage="quote", memoize=True) is quote
+    with pytest.raises(ValidationError):
+        validate_payload(invalid, SCHEMA, stage="quote", memoize=True)
+    assert check_payload(quote, SCHEMA, stage="quote", memoize=True) == []
+    assert [v.path for v in check_payload(invalid, SCHEMA, stage="quote")] == [
+        v.path for v in check_payload(invalid, SCHEMA, stage="quote", memoize=True)
+    ]
+    result = validate_batch([quote, invalid], SCHEMA, "quote", memoize=True)
+    assert list(result.invalid) == [1]
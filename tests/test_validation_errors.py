@@ -0,0 +1,194 @@
+import pytest
+
+from validation_errors import (
+    ErrorCollector,
+    ErrorLimitReached,
+    ErrorReport,
+    InternTable,
+    Violation,
+    localize,
+    title_index,
+)
+
+
+def _report(*keywords):
+    report = ErrorReport()
+    for index, keyword in enumerate(keywords):
+        report.add(("items", index), keyword, "#/items/" + keyword, index, "x")
+    return report
+
+
+def test_reports_compare_by_violations():
+    report = _report("type", "required")
+    assert report == report
+    assert report == _report("type", "required")
+    assert report == list(report)
+    assert report != _report("type")
+    assert report != _report("required", "type")
+    assert report != list(_report("type", "enum"))
+    assert ErrorReport() == []
+    assert report != "type"
+
+
+def _payload_invalid():
+    from codegen_validator import compile_validator
+    from payload_invalid import PayloadInvalid
+    from schema_registry import load_schema
+    from stages import stage_schema
+
+    validator = compile_validator(stage_schema(load_schema("insurance"), "quote"))
+    try:
+        validator.validate({"insurance_holder": {"birth_date": 5}})
+    except PayloadInvalid as error:
+        return error
+    raise AssertionError("not raised")
+
+
+def _fields(error):
+    return (
+        type(error),
+        error.message,
+        list(error.path),
+        list(error.schema_path),
+        error.validator,
+        error.validator_value,
+        error.instance,
+        error.localized(),
+    )
+
+
+def test_payload_invalid_pickles_and_copies():
+    import copy
+    import pickle
+
+    from jsonschema import ValidationError
+
+    error = _payload_invalid()
+    error.path.appendleft("quote")
+    for other in (pickle.loads(pickle.dumps(error)), copy.copy(error)):
+        assert isinstance(other, ValidationError)
+        assert _fields(other) == _fields(error)
+
+
+def test_report_pickles_by_name():
+    import pickle
+
+    report = _report("type", "required")
+    data = pickle.dumps(report)
+    # Names, not this process's intern ids.
+    assert b"required" in data and b"#/items/type" in data
+    assert pickle.loads(data) == report
+
+
+def test_collector_stops_at_its_limit():
+    collector = ErrorCollector(2)
+    collector(("a",), "type", "#/properties/a/type", 1, "string")
+    with pytest.raises(ErrorLimitReached):
+        collector(("b",), "required", "#/required", {}, "b")
+    assert [(v.path, v.keyword) for v in collector.violations] == [
+        (("a",), "type"),
+        (("b",), "required"),
+    ]
+    unlimited = ErrorCollector()
+    for index in range(1000):
+        unlimited((index,), "type", "#/items/type", index, "string")
+    assert len(unlimited.violations) == 1000
+
+
+def test_schema_pointers_are_interned_per_validator():
+    from codegen_validator import compile_validator
+
+    schema = {"items": {"type": "string"}}
+    validator = compile_validator(schema)
+    other = compile_validator({"items": {"type": "integer"}})
+    first = validator.errors([1, 2])
+    assert first.pointers is validator.pointers
+    assert validator.errors([3]).pointers is validator.pointers
+    assert other.pointers is not validator.pointers
+    assert len(validator.pointers.values) == 1
+    # Reports of separate tables still compare by pointer.
+    assert first == _report_like(first)
+    assert first != other.errors(["x", "y"])
+
+
+def _report_like(report):
+    copy = ErrorReport(report.titles, InternTable())
+    for violation in report:
+        copy.add(
+            violation.path,
+            violation.keyword,
+            violation.schema_path,
+            violation.instance,
+            violation.expected,
+        )
+    return copy
+
+
+TITLED = {
+    "definitions": {
+        "person": {
+            "titles": {"pt-br": "Pessoa", "en": "Person"},
+            "type": "object",
+            "properties": {"name": {"titles": {"pt-br": "Nome"}}},
+        },
+        "holder": {
+            "allOf": [{"$ref": "#/definitions/person"}],
+            "properties": {"cpf": {"titles": {"pt-br": "CPF"}}},
+        },
+    },
+    "type": "object",
+    "properties": {
+        "holder": {"$ref": "#/definitions/holder"},
+        "people": {"items": {"$ref": "#/definitions/person"}},
+    },
+}
+
+
+def test_title_index_follows_refs_and_allof():
+    index = title_index(TITLED)
+    person = {"pt-br": "Pessoa", "en": "Person"}
+    assert index["#/properties/people/items"] == person
+    # holder has no titles of its own: through allOf it gets person's,
+    # and those of person's properties next to its own.
+    assert index["#/properties/holder"] == person
+    assert index["#/properties/holder/properties/name"] == {"pt-br": "Nome"}
+    assert index["#/properties/holder/properties/cpf"] == {"pt-br": "CPF"}
+    assert index["#/definitions/person"] == person
+
+
+def _violation(path, keyword, schema_path, instance, expected):
+    return Violation(
+        path, keyword, schema_path, instance, expected, titles=title_index(TITLED)
+    )
+
+
+def test_localize_uses_titles_and_falls_back_to_names():
+    missing = _violation(
+        ("holder",), "required", "#/properties/holder/required", {}, "cpf"
+    )
+    assert localize(missing) == "CPF é obrigatório em Pessoa ($.holder)"
+    assert localize(missing, "en") == "cpf is required in Person ($.holder)"
+    plain = _violation(("x",), "required", "#/required", {}, "y")
+    assert localize(plain, "en") == "y is required in x ($.x)"
+    wrong = _violation(
+        ("people", 0), "type", "#/properties/people/items/type", 5, "object"
+    )
+    assert localize(wrong) == "Pessoa ($.people[0]) deve ser do tipo objeto"
+    assert wrong.localized("en") == "Person ($.people[0]) must be of type object"
+
+
+def test_localize_renders_expected_values():
+    def message(keyword, expected, locale="pt-br"):
+        violation = _violation(
+            ("a",), keyword, "#/properties/a/" + keyword, 1, expected
+        )
+        return localize(violation, locale)
+
+    assert (
+        message("type", ["string", "null"]) == "a ($.a) deve ser do tipo texto ou nulo"
+    )
+    assert message("enum", ["x", 2]) == 'a ($.a) deve ser um dos valores "x", 2'
+    assert message("const", "é", "en") == 'a ($.a) must be "é"'
+    assert message("minLength", 3, "en") == "a ($.a) is invalid"
+    with pytest.raises(ValueError):
+        message("type", "string", "fr")
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+import validator_cache
+
+ENTRY = ("source", compile("x = 1", "<test>", "exec"), {})
+
+
+def test_entries_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setenv("VALIDATOR_CACHE_DIR", str(tmp_path / "cache"))
+    validator_cache.store("abc", False, *ENTRY)
+    assert validator_cache.load("abc") == ENTRY
+    assert validator_cache.load("abc", memoize=True) is None
+
+
+def test_default_directory_is_per_user(tmp_path, monkeypatch):
+    monkeypatch.delenv("VALIDATOR_CACHE_DIR", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert validator_cache.cache_dir() == str(tmp_path / "validator-cache")
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_writable_by_others_is_ignored(tmp_path, monkeypatch):
+    directory = tmp_path / "cache"
+    monkeypatch.setenv("VALIDATOR_CACHE_DIR", str(directory))
+    validator_cache.store("abc", False, *ENTRY)
+    directory.chmod(0o777)
+    assert validator_cache.load("abc") is None
+    validator_cache.store("def", False, *ENTRY)
+    assert not any(name.startswith("def") for name in os.listdir(directory))
+
+
+def test_entries_of_other_generator_digests_are_pruned(validator_cache_dir):
+    validator_cache_dir.mkdir(mode=0o700)
+    stale = validator_cache_dir / ("abc-%s.bin" % ("0" * 16))
+    stale.write_bytes(b"old")
+    other = validator_cache_dir / "notes.txt"
+    other.write_text("kept")
+    validator_cache.store("abc", False, *ENTRY)
+    assert not stale.exists()
+    assert other.exists()
+    assert validator_cache.load("abc") == ENTRY
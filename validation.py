@@ -0,0 +1,269 @@
+import json
+import threading
+import time
+
+from codegen_validator import compile_memoized, compile_validator
+from metrics import observe_validation, watch_cache
+from result_cache import CachedValidator, body_key
+from stages import compile_stage
+from validation_errors import FAIL_FAST, ErrorReport, error_limit, path_pattern
+
+_clock = time.perf_counter
+
+
+def _validation_error():
+    # For the except clauses below, which only evaluate it once something
+    # was raised: validating a valid payload never imports jsonschema.
+    from jsonschema import ValidationError
+
+    return ValidationError
+
+
+# The validators of the last few schema objects seen, by id(), so repeated
+# calls with the same object skip hashing it; the schema is kept in the
+# entry to pin its id. Schemas are treated as immutable once passed in.
+# Bounded, so callers that load or build the schema for every call do not
+# pile up entries; the validators themselves are shared by schema hash.
+_recent = {}
+_RECENT_SIZE = 16
+_recent_lock = threading.Lock()
+
+# How validate_payload and check_payload build validators; see
+# enable_profiling.
+_compile = compile_validator
+
+
+def enable_profiling(enabled=True):
+    """Validate parsed payloads with profiling validators from now on.
+
+    Read the results with ``profiling.profile()``. Off by default: then the
+    regular generated validators run and profiling costs nothing.
+    """
+    global _compile
+    from profiling import compile_profiled
+
+    _compile = compile_profiled if enabled else compile_validator
+
+
+def _compiler(memoize):
+    # Memoized validators are never profiled.
+    return compile_memoized if memoize else _compile
+
+
+def _validator_for(schema, compile=compile_validator, stage=None):
+    key = (id(schema), compile, stage)
+    entry = _recent.get(key)
+    if entry is not None and entry[0] is schema:
+        return entry[1]
+    if stage is None:
+        validator = compile(schema)
+    else:
+        validator = compile_stage(schema, stage, compile)
+    with _recent_lock:
+        _recent.pop(key, None)
+        if len(_recent) >= _RECENT_SIZE:
+            # Dicts keep insertion order: drop the oldest.
+            del _recent[next(iter(_recent))]
+        _recent[key] = (schema, validator)
+    return validator
+
+
+def _frozen(self, *args, **kwargs):
+    raise TypeError("frozen payload cannot be modified")
+
+
+class FrozenDict(dict):
+    """A dict that refuses modification; still a dict to the validators."""
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _frozen
+    clear = pop = popitem = setdefault = update = _frozen
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class FrozenList(list):
+    """A list that refuses modification; still a list to the validators."""
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _frozen
+    append = extend = insert = pop = remove = reverse = sort = clear = _frozen
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def deep_copy(value):
+    """Copy a JSON document: new dicts and lists, shared (immutable) scalars."""
+    if isinstance(value, dict):
+        return {key: deep_copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [deep_copy(item) for item in value]
+    return value
+
+
+def deep_freeze(value):
+    """Copy a JSON document into FrozenDict/FrozenList containers."""
+    if isinstance(value, dict):
+        return FrozenDict((key, deep_freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(deep_freeze(item) for item in value)
+    return value
+
+
+_ISOLATION = {None: None, "copy": deep_copy, "freeze": deep_freeze}
+
+
+def _cached(validator, cache):
+    if cache is None:
+        return validator
+    watch_cache(cache)
+    return CachedValidator(validator, cache)
+
+
+def validate_payload(
+    instance, schema, isolation=None, stage=None, cache=None, memoize=False
+):
+    """Validate an already-parsed payload against ``schema``.
+
+    Dicts and lists are validated as they are; there is no serialize/parse
+    round trip. Pass ``isolation="copy"`` to validate (and get back) a
+    private deep copy, or ``isolation="freeze"`` for an immutable one, when
+    the caller's document may change after validation. Returns the
+    validated document and raises ``jsonschema.ValidationError`` if it is
+    invalid.
+
+    With ``stage="quote"`` or ``stage="contract"`` the payload is one
+    stage's document, checked by that stage's own validator. Pass a
+    ``result_cache.ResultCache`` as ``cache`` to reuse the verdicts of
+    payloads seen before.
+
+    ``memoize=True`` checks each container object of the payload once per
+    shared definition, however many places reference it (see
+    ``CodegenValidator``). Only the same object is recognized: equal but
+    distinct dicts, such as those of a freshly parsed body, are each
+    checked in full.
+    """
+    try:
+        isolate = _ISOLATION[isolation]
+    except KeyError:
+        raise ValueError("isolation must be None, 'copy' or 'freeze'") from None
+    if isolate is not None:
+        instance = isolate(instance)
+    validator = _cached(_validator_for(schema, _compiler(memoize), stage), cache)
+    start = _clock()
+    try:
+        validator.validate(instance)
+    except _validation_error() as error:
+        failures = [path_pattern(error.absolute_path)]
+        observe_validation(stage, _clock() - start, failures)
+        raise
+    observe_validation(stage, _clock() - start)
+    return instance
+
+
+def validate_bytes(
+    data, schema, fail_fast=None, stage=None, cache=None, streaming=False
+):
+    """Parse and validate a raw JSON body (bytes, memoryview or str).
+
+    The body is parsed with ``json.loads`` and checked by the same
+    validator as ``validate_payload``. Returns the parsed document; raises
+    ``jsonschema.ValidationError`` or ``json.JSONDecodeError``. ``stage`` is
+    as for ``validate_payload``.
+
+    ``streaming=True`` validates while parsing instead, with the pure-Python
+    event parser of bytes_validation: with ``fail_fast`` (its default) an
+    invalid body is rejected after reading only up to the offending value,
+    but every body read to the end (each valid one) costs many times more.
+    It only pays off where large bodies are mostly invalid early on.
+    ``fail_fast`` only applies to streaming, and is a ValueError without it.
+
+    With a ``cache``, a body already known to be valid (byte for byte) is
+    only parsed, with ``json.loads``, and not validated again.
+    """
+    if streaming:
+        from bytes_validation import compile_streaming
+
+        validator = _validator_for(schema, compile_streaming, stage)
+        check = _stream
+        if fail_fast is None:
+            fail_fast = True
+    elif fail_fast is not None:
+        raise ValueError("fail_fast only applies with streaming=True")
+    else:
+        validator = _validator_for(schema, _compile, stage)
+        check = _parse_then_validate
+    start = _clock()
+    try:
+        document = _validate_bytes(validator, check, data, fail_fast, cache)
+    except _validation_error() as error:
+        failures = [path_pattern(error.absolute_path)]
+        observe_validation(stage, _clock() - start, failures, len(data))
+        raise
+    except ValueError:
+        observe_validation(stage, _clock() - start, size=len(data), malformed=True)
+        raise
+    observe_validation(stage, _clock() - start, size=len(data))
+    return document
+
+
+def _loads(data):
+    # json.loads takes bytes and str, not memoryview.
+    return json.loads(data if isinstance(data, (bytes, str)) else bytes(data))
+
+
+def _stream(validator, data, fail_fast):
+    return validator.validate(data, fail_fast)
+
+
+def _parse_then_validate(validator, data, fail_fast):
+    document = _loads(data)
+    validator.validate(document)
+    return document
+
+
+def _validate_bytes(validator, check, data, fail_fast, cache):
+    if cache is None:
+        return check(validator, data, fail_fast)
+    watch_cache(cache)
+    key = body_key(data, validator.hash)
+    if cache.get(key):
+        return _loads(data)
+    try:
+        document = check(validator, data, fail_fast)
+    except _validation_error():
+        cache.put(key, False)
+        raise
+    cache.put(key, True)
+    return document
+
+
+def check_payload(
+    instance,
+    schema,
+    mode=FAIL_FAST,
+    max_errors=100,
+    stage=None,
+    cache=None,
+    memoize=False,
+):
+    """Validate a parsed payload and return its violations (empty if valid).
+
+    ``mode="fail_fast"`` stops at the first violation. ``mode="collect_all"``
+    returns every violation with its instance path, but stops after
+    ``max_errors`` so a payload with thousands of bad items costs no more
+    than ``max_errors`` reports. ``stage``, ``cache`` and ``memoize`` are as
+    for ``validate_payload``.
+    """
+    limit = error_limit(mode, max_errors)
+    validator = _cached(_validator_for(schema, _compiler(memoize), stage), cache)
+    start = _clock()
+    violations = validator.errors(instance, limit)
+    if isinstance(violations, ErrorReport):
+        failures = [path_pattern(path) for path in violations.paths]
+    else:
+        failures = [path_pattern(violation.path) for violation in violations]
+    observe_validation(stage, _clock() - start, failures)
+    return violations
@@ -0,0 +1,462 @@
+import json
+import threading
+from array import array
+
+FAIL_FAST = "fail_fast"
+COLLECT_ALL = "collect_all"
+MODES = (FAIL_FAST, COLLECT_ALL)
+
+
+class ErrorLimitReached(Exception):
+    """Raised by an ErrorCollector to stop validation once it is full."""
+
+
+def json_path(path):
+    """Render an instance path tuple as ``$.insurance_holder.phones[2]``."""
+    parts = ["$"]
+    for part in path:
+        parts.append("[%d]" % part if isinstance(part, int) else ".%s" % part)
+    return "".join(parts)
+
+
+def path_pattern(path):
+    """Like json_path, with every array index as ``[*]`` (for metric labels)."""
+    parts = ["$"]
+    for part in path:
+        parts.append("[*]" if isinstance(part, int) else ".%s" % part)
+    return "".join(parts)
+
+
+def _types(expected):
+    return ", ".join(map(repr, [expected] if isinstance(expected, str) else expected))
+
+
+_MESSAGES = {
+    "type": lambda v, e: "%r is not of type %s" % (v, _types(e)),
+    "required": lambda v, e: "%r is a required property" % (e,),
+    "additionalProperties": lambda v, e: (
+        "Additional properties are not allowed (%r was unexpected)" % (e,)
+    ),
+    "enum": lambda v, e: "%r is not one of %r" % (v, e),
+    "const": lambda v, e: "%r was expected" % (e,),
+    "anyOf": lambda v, e: "%r is not valid under any of the given schemas" % (v,),
+    "oneOf": lambda v, e: (
+        "%r is not valid under exactly one of the given schemas" % (v,)
+    ),
+    "not": lambda v, e: "%r should not be valid under %r" % (v, e),
+    "items": lambda v, e: "Expected no items but found %d" % len(v),
+    "false": lambda v, e: "False schema does not allow %r" % (v,),
+}
+
+# User-facing messages by locale. Fields are named by the ``titles`` of
+# their subschema in that locale when there is one, by their key if not.
+_LOCALIZED = {
+    "pt-br": {
+        "messages": {
+            "type": "{field} ({path}) deve ser do tipo {expected}",
+            "required": "{field} é obrigatório em {parent} ({path})",
+            "additionalProperties": "{field} não é permitido em {parent} ({path})",
+            "enum": "{field} ({path}) deve ser um dos valores {expected}",
+            "const": "{field} ({path}) deve ser {expected}",
+            None: "{field} ({path}) é inválido",
+        },
+        "types": {
+            "object": "objeto",
+            "array": "lista",
+            "string": "texto",
+            "boolean": "booleano",
+            "null": "nulo",
+            "number": "número",
+            "integer": "inteiro",
+        },
+        "or": " ou ",
+    },
+    "en": {
+        "messages": {
+            "type": "{field} ({path}) must be of type {expected}",
+            "required": "{field} is required in {parent} ({path})",
+            "additionalProperties": "{field} is not allowed in {parent} ({path})",
+            "enum": "{field} ({path}) must be one of {expected}",
+            "const": "{field} ({path}) must be {expected}",
+            None: "{field} ({path}) is invalid",
+        },
+        "types": {},
+        "or": " or ",
+    },
+}
+LOCALES = tuple(_LOCALIZED)
+
+# Keywords whose values are subschemas, alone, in a list or by name.
+_SUBSCHEMA = ("items", "additionalProperties", "not")
+_SUBSCHEMA_LISTS = ("allOf", "anyOf", "oneOf", "prefixItems")
+_SUBSCHEMA_MAPS = ("properties", "patternProperties", "definitions", "$defs")
+
+
+def title_index(schema):
+    """Map the pointer of every subschema of ``schema`` to its ``titles``.
+
+    Pointers are those of ``Violation.schema_path`` without the keyword,
+    e.g. ``#/properties/insurance_holder``. A subschema without titles of
+    its own gets those of its ``$ref`` target, and its properties include
+    those it gets through ``$ref`` and ``allOf``, where the generated code
+    reports their ``required`` violations. Built once per compiled
+    validator, so localizing a message is a few dict lookups.
+    """
+    from codegen_validator import _escape_pointer, resolve_pointer
+
+    index = {}
+
+    def resolve(ref):
+        try:
+            return resolve_pointer(schema, ref)
+        except (LookupError, ValueError, TypeError):
+            return None
+
+    def titles_of(node):
+        seen = set()
+        while isinstance(node, dict):
+            if isinstance(node.get("titles"), dict):
+                return node["titles"]
+            ref = node.get("$ref")
+            if not isinstance(ref, str) or ref in seen:
+                break
+            seen.add(ref)
+            node = resolve(ref)
+        return None
+
+    def merge(node, pointer, seen):
+        # setdefault: what the subschema says itself wins over what it
+        # inherits.
+        if not isinstance(node, dict):
+            return
+        titles = titles_of(node)
+        if titles is not None:
+            index.setdefault(pointer, titles)
+        if isinstance(node.get("properties"), dict):
+            for name, subschema in node["properties"].items():
+                titles = titles_of(subschema)
+                if titles is not None:
+                    child = "%s/properties/%s" % (pointer, _escape_pointer(name))
+                    index.setdefault(child, titles)
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref not in seen:
+            merge(resolve(ref), pointer, seen | {ref})
+        if isinstance(node.get("allOf"), list):
+            for subschema in node["allOf"]:
+                merge(subschema, pointer, seen)
+
+    def walk(node, pointer):
+        if not isinstance(node, dict):
+            return
+        merge(node, pointer, frozenset())
+        for keyword in _SUBSCHEMA:
+            if keyword in node:
+                walk(node[keyword], pointer + "/" + keyword)
+        for keyword in _SUBSCHEMA_LISTS:
+            if isinstance(node.get(keyword), list):
+                for i, subschema in enumerate(node[keyword]):
+                    walk(subschema, "%s/%s/%d" % (pointer, keyword, i))
+        for keyword in _SUBSCHEMA_MAPS:
+            if isinstance(node.get(keyword), dict):
+                for name, subschema in node[keyword].items():
+                    walk(
+                        subschema,
+                        "%s/%s/%s" % (pointer, keyword, _escape_pointer(name)),
+                    )
+
+    walk(schema, "#")
+    return index
+
+
+def _title(titles, pointer, locale, default):
+    title = titles.get(pointer)
+    if title is not None:
+        title = title.get(locale)
+    return default if title is None else title
+
+
+def _json(value):
+    return json.dumps(value, ensure_ascii=False, default=repr)
+
+
+def localize(violation, locale="pt-br"):
+    """Render ``violation`` as a user-facing message in ``locale``."""
+    try:
+        language = _LOCALIZED[locale]
+    except KeyError:
+        raise ValueError("locale must be one of %s" % (LOCALES,)) from None
+    titles = violation.titles or {}
+    keyword, path, expected = violation.keyword, violation.path, violation.expected
+    # The subschema the keyword belongs to; a false schema is its own.
+    pointer = violation.schema_path
+    if keyword != "false":
+        pointer = pointer.rsplit("/", 1)[0]
+    names = [part for part in path if isinstance(part, str)]
+    name = names[-1] if names else "$"
+    parent = field = _title(titles, pointer, locale, name)
+    if keyword in ("required", "additionalProperties"):
+        from codegen_validator import _escape_pointer
+
+        child = "%s/properties/%s" % (pointer, _escape_pointer(expected))
+        field = _title(titles, child, locale, expected)
+    if keyword == "type":
+        types = [expected] if isinstance(expected, str) else expected
+        expected = language["or"].join(language["types"].get(t, t) for t in types)
+    elif keyword == "enum":
+        expected = ", ".join(map(_json, expected))
+    elif keyword == "const":
+        expected = _json(expected)
+    messages = language["messages"]
+    return messages.get(keyword, messages[None]).format(
+        field=field, parent=parent, path=json_path(path), expected=expected
+    )
+
+
+class Violation:
+    """One failed keyword: where in the instance, and which schema rule.
+
+    ``path`` is the instance path as a tuple of keys and indices,
+    ``schema_path`` the JSON pointer of the failing keyword in the
+    (flattened) schema. The message is only rendered when asked for;
+    ``titles`` is the title_index of the schema, for localized().
+    """
+
+    __slots__ = (
+        "path",
+        "keyword",
+        "schema_path",
+        "instance",
+        "expected",
+        "titles",
+        "_message",
+    )
+
+    def __init__(
+        self,
+        path,
+        keyword,
+        schema_path,
+        instance,
+        expected=None,
+        message=None,
+        titles=None,
+    ):
+        self.path = path
+        self.keyword = keyword
+        self.schema_path = schema_path
+        self.instance = instance
+        self.expected = expected
+        self.titles = titles
+        self._message = message
+
+    @property
+    def json_path(self):
+        return json_path(self.path)
+
+    @property
+    def message(self):
+        if self._message is None:
+            render = _MESSAGES.get(self.keyword)
+            if render is None:
+                self._message = "%r failed %r" % (self.instance, self.keyword)
+            else:
+                self._message = render(self.instance, self.expected)
+        return self._message
+
+    def localized(self, locale="pt-br"):
+        return localize(self, locale)
+
+    def __repr__(self):
+        return "<Violation %s %s: %s>" % (self.json_path, self.keyword, self.message)
+
+
+class InternTable:
+    """Small integer ids for the strings of a fixed, bounded set."""
+
+    __slots__ = ("ids", "values", "lock")
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+        self.lock = threading.Lock()
+
+    def id(self, value):
+        ident = self.ids.get(value)
+        if ident is None:
+            with self.lock:
+                ident = self.ids.get(value)
+                if ident is None:
+                    ident = self.ids[value] = len(self.values)
+                    self.values.append(value)
+        return ident
+
+
+# Keywords come from the generator's fixed set; reports store their ids.
+# Schema pointers are interned per validator (see ErrorReport), so the
+# pointers of schemas no longer in use go away with their validators.
+_KEYWORDS = InternTable()
+
+
+class ErrorReport:
+    """The violations of one validation, stored column-wise.
+
+    ``paths`` holds the instance path tuples; ``keyword_ids`` and
+    ``pointer_ids`` are arrays of ids of the keyword and schema pointer of
+    each violation; ``instances`` and ``expected`` reference (never copy)
+    the failing values; ``titles`` is the validator's title_index and
+    ``pointers`` the InternTable of its schema pointers, both shared by
+    every report of the validator (a report of its own gets a new table).
+    Nothing else is built: indexing or iterating the report gives Violation
+    objects, whose messages are only rendered when read.
+    """
+
+    __slots__ = (
+        "paths",
+        "keyword_ids",
+        "pointer_ids",
+        "instances",
+        "expected",
+        "titles",
+        "pointers",
+    )
+
+    def __init__(self, titles=None, pointers=None):
+        self.paths = []
+        self.keyword_ids = array("H")
+        self.pointer_ids = array("L")
+        self.instances = []
+        self.expected = []
+        self.titles = titles
+        self.pointers = InternTable() if pointers is None else pointers
+
+    def add(self, path, keyword, schema_path, instance, expected=None):
+        self.paths.append(path)
+        self.keyword_ids.append(_KEYWORDS.id(keyword))
+        self.pointer_ids.append(self.pointers.id(schema_path))
+        self.instances.append(instance)
+        self.expected.append(expected)
+
+    def keyword(self, index):
+        return _KEYWORDS.values[self.keyword_ids[index]]
+
+    def schema_path(self, index):
+        return self.pointers.values[self.pointer_ids[index]]
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return Violation(
+            self.paths[index],
+            self.keyword(index),
+            self.schema_path(index),
+            self.instances[index],
+            self.expected[index],
+            titles=self.titles,
+        )
+
+    def __iter__(self):
+        for index in range(len(self.paths)):
+            yield self[index]
+
+    def localized(self, locale="pt-br"):
+        """The message of every violation in ``locale``."""
+        return [localize(violation, locale) for violation in self]
+
+    def __eq__(self, other):
+        # Same violations: paths, keywords, schema pointers and expected
+        # values, in order. A list compares by the same fields of its
+        # Violations, so an empty report equals [].
+        if isinstance(other, ErrorReport):
+            if self.pointers is other.pointers:
+                same_pointers = self.pointer_ids == other.pointer_ids
+            else:
+                same_pointers = len(self) == len(other) and all(
+                    self.schema_path(i) == other.schema_path(i)
+                    for i in range(len(self))
+                )
+            return (
+                self.paths == other.paths
+                and self.keyword_ids == other.keyword_ids
+                and same_pointers
+                and self.expected == other.expected
+            )
+        if not isinstance(other, list):
+            return NotImplemented
+        return len(other) == len(self) and all(
+            isinstance(v, Violation)
+            and v.path == self.paths[i]
+            and v.keyword == self.keyword(i)
+            and v.schema_path == self.schema_path(i)
+            and v.expected == self.expected[i]
+            for i, v in enumerate(other)
+        )
+
+    def __reduce__(self):
+        # Keyword and pointer ids are only valid in this process: pickle
+        # the names, for reports sent to or from pool workers.
+        rows = [
+            (path, self.keyword(i), self.schema_path(i), instance, expected)
+            for i, (path, instance, expected) in enumerate(
+                zip(self.paths, self.instances, self.expected)
+            )
+        ]
+        return _rebuild_report, (rows, self.titles)
+
+    def __repr__(self):
+        return "<ErrorReport of %d violation(s)>" % len(self)
+
+
+def _rebuild_report(rows, titles):
+    report = ErrorReport(titles)
+    for row in rows:
+        report.add(*row)
+    return report
+
+
+class ErrorCollector:
+    """Report callback for the generated error functions.
+
+    Stores up to ``limit`` violations (``None`` for no limit) in an
+    ErrorReport and then raises ErrorLimitReached, so the walk stops as
+    soon as enough errors are known. ``titles`` and ``pointers`` are as for
+    ErrorReport.
+    """
+
+    __slots__ = ("violations", "limit")
+
+    def __init__(self, limit=None, titles=None, pointers=None):
+        self.violations = ErrorReport(titles, pointers)
+        self.limit = limit
+
+    def __call__(self, path, keyword, schema_path, instance, expected=None):
+        violations = self.violations
+        violations.add(path, keyword, schema_path, instance, expected)
+        if self.limit is not None and len(violations) >= self.limit:
+            raise ErrorLimitReached
+
+
+def __getattr__(name):
+    # PayloadInvalid subclasses jsonschema's ValidationError, so it lives in
+    # payload_invalid, imported once asked for: importing this module, or
+    # validating a valid payload, does not import jsonschema.
+    if name == "PayloadInvalid":
+        from payload_invalid import PayloadInvalid
+
+        return PayloadInvalid
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def error_limit(mode, max_errors):
+    """Number of errors to collect for a validation ``mode``."""
+    if mode == FAIL_FAST:
+        return 1
+    if mode == COLLECT_ALL:
+        if max_errors is None or max_errors < 1:
+            raise ValueError("collect_all needs a positive max_errors")
+        return max_errors
+    raise ValueError("mode must be one of %s" % (MODES,))
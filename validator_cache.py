@@ -0,0 +1,139 @@
+"""On-disk cache of generated validators, for fast cold starts.
+
+Building a CodegenValidator checks the schema against its metaschema,
+flattens it, generates Python source and compiles it: tens of
+milliseconds for the insurance schema. The result is saved here, per
+schema hash, as the marshalled code object plus the title index, so a new
+process only reads one file and runs the code.
+
+Entries live in ``$VALIDATOR_CACHE_DIR`` (default: ``validator-cache`` in
+``$XDG_CACHE_HOME`` or ``~/.cache``); set it to ``off`` to disable the
+cache. As its entries are run as code, a directory that is not owned by
+the current user, or that others can write to, is ignored.
+"""
+
+import hashlib
+import marshal
+import os
+import stat
+import tempfile
+from importlib.util import MAGIC_NUMBER
+
+_FORMAT = 1
+
+# The generated code depends on these modules as much as on the schema.
+_GENERATOR_MODULES = (
+    "codegen_validator.py",
+    "schema_flattener.py",
+    "validation_errors.py",
+)
+
+_digest = None
+
+
+def cache_dir():
+    directory = os.environ.get("VALIDATOR_CACHE_DIR")
+    if directory is None:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        directory = os.path.join(base, "validator-cache")
+    return None if directory == "off" else directory
+
+
+def _trusted(directory):
+    """Whether only the current user can have written ``directory``'s entries."""
+    if not hasattr(os, "getuid"):
+        return True
+    try:
+        info = os.stat(directory)
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(info.st_mode)
+        and info.st_uid == os.getuid()
+        and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    )
+
+
+def _generator_digest():
+    """Hash of everything an entry depends on besides the schema.
+
+    The bytecode format and the generator's own source: an upgraded Python
+    or a changed generator makes every older entry a miss.
+    """
+    global _digest
+    if _digest is None:
+        digest = hashlib.sha256(MAGIC_NUMBER + str(_FORMAT).encode("ascii"))
+        here = os.path.dirname(os.path.abspath(__file__))
+        for name in _GENERATOR_MODULES:
+            with open(os.path.join(here, name), "rb") as f:
+                digest.update(f.read())
+        _digest = digest.hexdigest()[:16]
+    return _digest
+
+
+def _path(schema_hash, memoize):
+    directory = cache_dir()
+    if directory is None:
+        return None
+    name = "%s-%s%s.bin" % (
+        schema_hash,
+        _generator_digest(),
+        "-memo" if memoize else "",
+    )
+    return os.path.join(directory, name)
+
+
+def load(schema_hash, memoize=False):
+    """``(source, code, titles)`` cached for a schema, or None."""
+    path = _path(schema_hash, memoize)
+    if path is None or not _trusted(os.path.dirname(path)):
+        return None
+    try:
+        with open(path, "rb") as f:
+            entry = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    # A truncated or foreign file reads as something else entirely.
+    if not (isinstance(entry, tuple) and len(entry) == 3):
+        return None
+    return entry
+
+
+def store(schema_hash, memoize, source, code, titles):
+    """Save a generated validator; best effort, as the cache is optional."""
+    path = _path(schema_hash, memoize)
+    if path is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        if not _trusted(os.path.dirname(path)):
+            return
+        # Written aside and renamed, so readers never see half a file.
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump((source, code, titles), f)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        _prune(os.path.dirname(path))
+    except OSError:
+        pass
+
+
+def _prune(directory):
+    """Remove the entries of other generator digests from ``directory``.
+
+    Run when an entry is stored, which only happens on a miss: after an
+    upgrade, the first new entry clears out everything the old code wrote.
+    """
+    current = "-%s" % _generator_digest()
+    for name in os.listdir(directory):
+        if name.endswith(".bin") and current not in name:
+            try:
+                os.unlink(os.path.join(directory, name))
+            except OSError:
+                pass